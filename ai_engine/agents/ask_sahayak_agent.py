@@ -6,11 +6,12 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.genai import types
 from google.cloud import translate_v2 as translate
-from dotenv import load_dotenv
 
+from ..config import get_settings
 from ..models import AskSahayakOutput
 
-load_dotenv()
+# Populate the environment from .env before the ADK reads credentials
+get_settings()
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -25,7 +26,7 @@ def detect_language(text: str) -> Optional[str]:
         result = translate_client.detect_language(text)
         return result.get("language")
     except Exception as e:
-        logger.error(f"Language detection failed: {e}")
+        logger.error("Language detection failed: %s", e)
         return None
 
 
@@ -51,6 +52,12 @@ class AskSahayakAgent:
         )
         self.session_service = InMemorySessionService()
         self.app_name = "ask_sahayak_app"
+        # Built once; conversations are kept apart by their session ids
+        self.runner = Runner(
+            app_name=self.app_name,
+            agent=self.agent,
+            session_service=self.session_service,
+        )
 
     async def setup_session(self, user_id: str, session_id: Optional[str] = None):
         """Setup session - create new if no session_id provided, else fetch existing."""
@@ -62,7 +69,7 @@ class AskSahayakAgent:
                 user_id=user_id,
                 session_id=session_id,
             )
-            logger.info(f"Created new session: {session_id}")
+            logger.info("Created new session: %s", session_id)
         else:
             # Fetch existing session
             session = await self.session_service.get_session(
@@ -70,7 +77,7 @@ class AskSahayakAgent:
             )
             if session is None:
                 raise Exception(f"Session {session_id} not found for user {user_id}")
-            logger.info(f"Retrieved existing session: {session_id}")
+            logger.info("Retrieved existing session: %s", session_id)
 
         return session
 
@@ -100,13 +107,7 @@ class AskSahayakAgent:
         self, message_content: types.Content, user_id: str, session_id: str
     ) -> str:
         """Run the agent and extract text response."""
-        runner = Runner(
-            app_name=self.app_name,
-            agent=self.agent,
-            session_service=self.session_service,
-        )
-
-        async for event in runner.run_async(
+        async for event in self.runner.run_async(
             user_id=user_id,
             session_id=session_id,
             new_message=message_content,
@@ -139,7 +140,7 @@ class AskSahayakAgent:
             return AskSahayakOutput(response=response, session_id=session.id)
 
         except Exception as e:
-            logger.error(f"Error processing question: {e}")
+            logger.error("Error processing question: %s", e)
             raise
 
 
@@ -1,14 +1,18 @@
 import json
 import logging
+import orjson
+from uuid import uuid4
 from abc import ABC, abstractmethod
 from typing import Any, TypeVar, Generic
 from google.adk.agents import Agent
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.genai import types
-from dotenv import load_dotenv
 
-load_dotenv()
+from ..config import get_settings
+
+# Populate the environment from .env before the ADK reads credentials
+get_settings()
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,22 +31,40 @@ class BaseAgent(ABC, Generic[T]):
     def __init__(self, agent: Agent, app_name: str = None, session_id: str = None):
         self.agent = agent
         self.app_name = app_name or DEFAULT_APP_NAME
-        self.session_id = session_id or f"{agent.name}_session_001"
+        self.session_id = session_id or f"{agent.name}_session"
         self.user_id = DEFAULT_USER_ID
 
+        # Built once and shared by all requests; each request gets its own session
+        self.session_service = InMemorySessionService()
+        self.runner = Runner(
+            app_name=self.app_name,
+            agent=self.agent,
+            session_service=self.session_service,
+        )
+
     async def setup_session(self) -> tuple:
-        """Set up session and required services."""
+        """Create a fresh session for a single request on the shared service."""
         try:
-            session_service = InMemorySessionService()
-            session = await session_service.create_session(
-                app_name=self.app_name, user_id=self.user_id, session_id=self.session_id
+            session = await self.session_service.create_session(
+                app_name=self.app_name,
+                user_id=self.user_id,
+                session_id=f"{self.session_id}_{uuid4().hex}",
             )
             logger.debug("Session setup completed successfully")
-            return session_service, session
+            return self.session_service, session
         except Exception as e:
-            logger.error(f"Failed to setup session: {e}")
+            logger.error("Failed to setup session: %s", e)
             raise
 
+    async def close_session(self, session) -> None:
+        """Drop a finished request's session so the shared service does not grow."""
+        try:
+            await self.session_service.delete_session(
+                app_name=self.app_name, user_id=self.user_id, session_id=session.id
+            )
+        except Exception as e:
+            logger.warning("Failed to delete session %s: %s", session.id, e)
+
     @abstractmethod
     def create_message_content(self, **kwargs) -> types.Content:
         """Create properly formatted message content. Must be implemented by subclasses."""
@@ -53,24 +75,27 @@ class BaseAgent(ABC, Generic[T]):
         """Parse agent response to output model. Must be implemented by subclasses."""
         pass
 
+    def parse_response_text(self, text_content: str) -> T:
+        """Parse a JSON text response to the output model. Subclasses may parse directly."""
+        try:
+            data = orjson.loads(text_content)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (e.g. NaN), fall back to stdlib
+            data = json.loads(text_content)
+        return self.parse_response_to_output(data)
+
     async def run_agent(self, message_content: types.Content) -> T:
         """Run the agent and return the structured output."""
-        logger.info(f"Running {self.agent.name}...")
+        logger.info("Running %s...", self.agent.name)
 
+        session = None
         try:
-            # Setup session and services
-            session_service, session = await self.setup_session()
+            # Setup a per-request session on the shared runner
+            _, session = await self.setup_session()
 
-            # Create runner
-            runner = Runner(
-                app_name=self.app_name,
-                agent=self.agent,
-                session_service=session_service,
-            )
-
-            async for event in runner.run_async(
+            async for event in self.runner.run_async(
                 user_id=self.user_id,
-                session_id=self.session_id,
+                session_id=session.id,
                 new_message=message_content,
             ):
                 if event.is_final_response():
@@ -78,48 +103,53 @@ class BaseAgent(ABC, Generic[T]):
                         continue
 
                     for part in event.content.parts:
+                        function_response = getattr(part, "function_response", None)
+                        text = getattr(part, "text", None)
+
                         # Check if it's a function response (structured output)
-                        if (
-                            hasattr(part, "function_response")
-                            and part.function_response
-                        ):
+                        if function_response:
                             try:
                                 output = self.parse_response_to_output(
-                                    part.function_response
+                                    function_response
                                 )
                                 logger.info(
-                                    f"Successfully created output from {self.agent.name}"
+                                    "Successfully created output from %s",
+                                    self.agent.name,
                                 )
                                 return output
                             except Exception as e:
-                                logger.error(f"Error parsing function_response: {e}")
+                                logger.error("Error parsing function_response: %s", e)
                                 continue
 
                         # Check if it's text content
-                        elif hasattr(part, "text") and part.text:
-                            text_content = part.text.strip()
+                        elif text:
+                            text_content = text.strip()
                             try:
-                                data = json.loads(text_content)
-                                output = self.parse_response_to_output(data)
+                                output = self.parse_response_text(text_content)
                                 logger.info(
-                                    f"Successfully created output from {self.agent.name}"
+                                    "Successfully created output from %s",
+                                    self.agent.name,
                                 )
                                 return output
                             except json.JSONDecodeError as e:
-                                logger.error(f"JSON parsing error: {e}")
+                                logger.error("JSON parsing error: %s", e)
                             except Exception as e:
-                                logger.error(f"Error creating output: {e}")
+                                logger.error("Error creating output: %s", e)
 
             raise Exception(f"Failed to extract data from {self.agent.name} response")
 
         except Exception as e:
-            logger.error(f"Error running {self.agent.name}: {e}")
+            logger.error("Error running %s: %s", self.agent.name, e)
             raise
 
+        finally:
+            if session is not None:
+                await self.close_session(session)
+
     async def generate(self, **kwargs) -> T:
         """Generate output using the agent. Must be implemented by subclasses."""
         try:
-            logger.info(f"Generating output with {self.agent.name}")
+            logger.info("Generating output with %s", self.agent.name)
 
             # Create message content
             message_content = self.create_message_content(**kwargs)
@@ -127,9 +157,9 @@ class BaseAgent(ABC, Generic[T]):
             # Run agent to generate output
             output = await self.run_agent(message_content)
 
-            logger.info(f"Successfully generated output with {self.agent.name}")
+            logger.info("Successfully generated output with %s", self.agent.name)
             return output
 
         except Exception as e:
-            logger.error(f"Error generating output with {self.agent.name}: {e}")
+            logger.error("Error generating output with %s: %s", self.agent.name, e)
             raise
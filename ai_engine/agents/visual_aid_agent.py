@@ -123,11 +123,12 @@ class VisualAidDesignerAgent(BaseAgent[VisualAidOutput]):
                     output = await self.run_agent(message_content)
 
                     logger.info(
-                        f"Successfully generated Mermaid syntax (attempt {attempt + 1})"
+                        "Successfully generated Mermaid syntax (attempt %s)",
+                        attempt + 1,
                     )
 
                     # Generate and upload the diagram
-                    diagram_url = mermaid_service.create_and_upload_diagram(
+                    diagram_url = await mermaid_service.create_and_upload_diagram(
                         mermaid_syntax=output.mermaid_syntax,
                         title=output.title,
                         subject=subject,
@@ -136,27 +137,29 @@ class VisualAidDesignerAgent(BaseAgent[VisualAidOutput]):
                     if diagram_url:
                         # Success! Break out of retry loop
                         logger.info(
-                            f"Successfully rendered diagram on attempt {attempt + 1}"
+                            "Successfully rendered diagram on attempt %s", attempt + 1
                         )
                         break
                     else:
                         # Rendering failed
                         if attempt < max_attempts - 1:
                             logger.warning(
-                                f"Failed to render diagram on attempt {attempt + 1}, retrying LLM call..."
+                                "Failed to render diagram on attempt %s, retrying LLM call...",
+                                attempt + 1,
                             )
                         else:
                             logger.error(
-                                f"Failed to render diagram after {max_attempts} attempts, returning output with Mermaid syntax only"
+                                "Failed to render diagram after %s attempts, returning output with Mermaid syntax only",
+                                max_attempts,
                             )
 
                 except Exception as e:
                     if attempt < max_attempts - 1:
                         logger.warning(
-                            f"Error on attempt {attempt + 1}: {e}, retrying..."
+                            "Error on attempt %s: %s, retrying...", attempt + 1, e
                         )
                     else:
-                        logger.error(f"Error on final attempt {attempt + 1}: {e}")
+                        logger.error("Error on final attempt %s: %s", attempt + 1, e)
                         raise
 
             # Build complete response with programmatically determined fields
@@ -170,11 +173,11 @@ class VisualAidDesignerAgent(BaseAgent[VisualAidOutput]):
                 "subject": subject,
             }
 
-            logger.info(f"Successfully created visual aid: {result['title']}")
+            logger.info("Successfully created visual aid: %s", result["title"])
             return result
 
         except Exception as e:
-            logger.error(f"Error generating visual aid: {e}")
+            logger.error("Error generating visual aid: %s", e)
             raise
 
 
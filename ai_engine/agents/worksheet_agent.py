@@ -1,4 +1,8 @@
+import io
+import asyncio
 import logging
+from typing import Tuple
+from PIL import Image
 from google.adk.agents import Agent
 from google.genai import types
 
@@ -8,6 +12,37 @@ from ..models import WorksheetOutput
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Longest image side sent to the model; larger photos are downscaled first, as
+# the model tiles images at a far lower resolution than phone cameras produce
+MAX_IMAGE_DIMENSION = 3072
+# JPEG quality for downscaled images
+DOWNSCALED_JPEG_QUALITY = 90
+
+
+def prepare_image(image_bytes: bytes) -> Tuple[bytes, str]:
+    """Return the image bytes to send and their MIME type, downscaling oversized images."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            mime_type = Image.MIME.get(image.format, "image/png")
+            if max(image.size) <= MAX_IMAGE_DIMENSION:
+                return image_bytes, mime_type
+
+            # Resampling runs in Pillow's C code, outside the GIL
+            image.draft("RGB", (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+            image = image.convert("RGB")
+            image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=DOWNSCALED_JPEG_QUALITY)
+
+        logger.info(
+            "Downscaled image from %s to %s bytes", len(image_bytes), buffer.tell()
+        )
+        return buffer.getvalue(), "image/jpeg"
+
+    except Exception as e:
+        logger.warning("Could not preprocess image, sending as-is: %s", e)
+        return image_bytes, "image/png"
+
 
 class WorksheetAgent(BaseAgent[WorksheetOutput]):
     """Agent for creating educational worksheets from textbook images."""
@@ -60,6 +95,7 @@ class WorksheetAgent(BaseAgent[WorksheetOutput]):
         subject: str = None,
         topic: str = None,
         description: str = None,
+        mime_type: str = "image/png",
     ) -> types.Content:
         """Create properly formatted message content with image and structured parameters."""
 
@@ -89,7 +125,7 @@ class WorksheetAgent(BaseAgent[WorksheetOutput]):
                 types.Part(
                     inline_data=types.Blob(
                         data=image_bytes,
-                        mime_type="image/png",
+                        mime_type=mime_type,
                         display_name=image_filename,
                     )
                 ),
@@ -98,8 +134,12 @@ class WorksheetAgent(BaseAgent[WorksheetOutput]):
         )
 
     def parse_response_to_output(self, response_data: dict) -> WorksheetOutput:
-        """Parse agent response to WorksheetOutput."""
-        return WorksheetOutput(**response_data)
+        """Validate the function response into WorksheetOutput."""
+        return WorksheetOutput.model_validate(response_data)
+
+    def parse_response_text(self, text_content: str) -> WorksheetOutput:
+        """Parse and validate the JSON text response in a single pydantic-core pass."""
+        return WorksheetOutput.model_validate_json(text_content)
 
 
 # Create a global instance of the agent
@@ -115,8 +155,10 @@ async def generate_worksheet_from_image(
     description: str = None,
 ) -> WorksheetOutput:
     """Generate a worksheet from image bytes with structured parameters."""
+    image_bytes, mime_type = await asyncio.to_thread(prepare_image, image_bytes)
     return await _worksheet_agent.generate(
         image_bytes=image_bytes,
+        mime_type=mime_type,
         grade=grade,
         image_filename=filename,
         subject=subject,
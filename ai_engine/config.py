@@ -0,0 +1,29 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Environment configuration shared by the API, agents and evaluation."""
+
+    google_api_key: Optional[str]
+    project_id: Optional[str]
+    location: Optional[str]
+    processor_id: Optional[str]
+    redis_url: Optional[str]
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load the .env file once and return the cached settings."""
+    load_dotenv()
+    return Settings(
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        project_id=os.getenv("PROJECT_ID"),
+        location=os.getenv("LOCATION"),
+        processor_id=os.getenv("PROCESSOR_ID"),
+        redis_url=os.getenv("REDIS_URL"),
+    )
@@ -1,29 +1,40 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 
 
 # API Request Models
 class WorksheetRequest(BaseModel):
-    image_base64: str
+    # JSON strings for bytes fields are base64-decoded during validation
+    model_config = ConfigDict(val_json_bytes="base64")
+
+    image_base64: bytes
     image_filename: Optional[str] = "image.png"
     grade: str
     subject: str
     topic: Optional[str] = None
     description: Optional[str] = None
 
+    @field_validator("image_base64", mode="before")
+    @classmethod
+    def strip_base64_whitespace(cls, value):
+        # MIME-style encoders wrap base64 at 76 columns; the decoder rejects newlines
+        if isinstance(value, str):
+            return "".join(value.split())
+        return value
+
 
-class LessonPlanRequest(BaseModel):
+class ContentRequest(BaseModel):
     subject: str
     grade: str
     topic: Optional[str] = None
     description: Optional[str] = None
 
 
-class StudyMaterialRequest(BaseModel):
-    subject: str
-    grade: str
-    topic: Optional[str] = None
-    description: Optional[str] = None
+# The generated-content endpoints take identical inputs, so they share one
+# model (and one compiled validator) under their own names
+LessonPlanRequest = ContentRequest
+StudyMaterialRequest = ContentRequest
+QuizRequest = ContentRequest
 
 
 class AskSahayakRequest(BaseModel):
@@ -32,12 +43,6 @@ class AskSahayakRequest(BaseModel):
     user_id: Optional[str] = "default_user"
 
 
-class QuizRequest(BaseModel):
-    subject: str
-    grade: str
-    topic: Optional[str] = None
-    description: Optional[str] = None
-
 class EvalQuizRequest(BaseModel):
     student_submission_url: str
     evaluation_json_url: str
@@ -4,13 +4,21 @@ from .pdf_service import (
     worksheet_to_pdf_bytes,
     lesson_plan_to_pdf_bytes,
     study_material_to_pdf_bytes,
+    run_in_pdf_pool,
+    start_pdf_pool,
+    shutdown_pdf_pool,
 )
 from .firebase_service import firebase_service
+from .cache_service import cache_service
 
 
 __all__ = [
     "worksheet_to_pdf_bytes",
     "lesson_plan_to_pdf_bytes",
     "study_material_to_pdf_bytes",
+    "run_in_pdf_pool",
+    "start_pdf_pool",
+    "shutdown_pdf_pool",
     "firebase_service",
+    "cache_service",
 ]
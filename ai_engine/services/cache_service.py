@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar, Union
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional; fall back to the in-process cache
+    redis = None
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Generated content is reused for a day
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Upper bound on in-process entries before the least recently used are dropped;
+# entries are small JSON responses, so a few thousand cost a few MB
+MAX_LOCAL_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "4096"))
+
+
+def make_key(namespace: str, *parts: Union[bytes, str, None]) -> str:
+    """Build a cache key from a content hash of the given request parts."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if part is None:
+            part = b""
+        elif isinstance(part, str):
+            part = part.encode()
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+class CacheService:
+    """TTL cache for generated results, backed by Redis when REDIS_URL is set"""
+
+    def __init__(self, ttl: int = DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._redis = None
+        self._inflight: "dict[str, asyncio.Future]" = {}
+
+        redis_url = get_settings().redis_url
+        if redis_url and redis is not None:
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+            logger.info("Using Redis cache")
+        elif redis_url:
+            logger.warning(
+                "REDIS_URL is set but redis is not installed; using local cache"
+            )
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None if missing or expired"""
+        if self._redis is not None:
+            try:
+                return await self._redis.get(key)
+            except Exception as e:
+                logger.error(f"Error reading from cache: {str(e)}")
+                return None
+
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+
+        self._local.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Store value under key for the cache TTL"""
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, value, ex=self.ttl)
+            except Exception as e:
+                logger.error(f"Error writing to cache: {str(e)}")
+            return
+
+        self._local[key] = (time.monotonic() + self.ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > MAX_LOCAL_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def close(self) -> None:
+        """Close the Redis connection pool, if one is in use"""
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def single_flight(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """Run compute once for concurrent callers with the same key; all share its result"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shielded so one caller being cancelled does not cancel the others
+        return await asyncio.shield(task)
+
+
+# Global instance
+cache_service = CacheService()
@@ -1,12 +1,32 @@
 import os
+import asyncio
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import IO, Optional
 import firebase_admin
 from firebase_admin import credentials, storage
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from google.cloud.storage.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive connections to Cloud Storage; at least as many as concurrent uploads
+STORAGE_HTTP_POOL_SIZE = 64
+
+# Payloads above this size go through the resumable protocol in chunks of this
+# size (a multiple of 256 KiB), so a dropped connection only resends one chunk
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Stable (non-timestamped) names are content-addressed and written once, so
+# browsers and caches may keep them indefinitely instead of re-downloading
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Threads draining fire-and-forget uploads (e.g. cache writes) off the request path
+BACKGROUND_UPLOAD_WORKERS = 4
+
 
 class FirebaseService:
     """Service for uploading files to Firebase Storage"""
@@ -14,6 +34,9 @@ class FirebaseService:
     def __init__(self):
         self._initialized = False
         self._bucket = None
+        self._upload_executor = None
+        self._upload_executor_pid = None
+        self._inflight_uploads = {}
 
     def initialize(self):
         """Initialize Firebase Admin SDK with service account key"""
@@ -36,6 +59,15 @@ class FirebaseService:
                 )
 
             self._bucket = storage.bucket()
+
+            # The storage client's session defaults to 10 pooled connections, so
+            # concurrent uploads beyond that would each open a fresh TLS connection
+            adapter = HTTPAdapter(
+                pool_connections=STORAGE_HTTP_POOL_SIZE,
+                pool_maxsize=STORAGE_HTTP_POOL_SIZE,
+            )
+            self._bucket.client._http.mount("https://", adapter)
+
             self._initialized = True
             logger.info("Firebase initialized successfully")
             return True
@@ -44,8 +76,28 @@ class FirebaseService:
             logger.error(f"Error initializing Firebase: {str(e)}")
             return False
 
+    def _build_storage_path(
+        self, folder: str, filename: str, timestamped: bool = True
+    ) -> str:
+        """Build the storage path, optionally adding a timestamp to the filename."""
+        if timestamped:
+            # Generate timestamped filename
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            name_parts = filename.rsplit(".", 1) if "." in filename else [filename, ""]
+            if len(name_parts) == 2:
+                filename = f"{name_parts[0]}_{timestamp}.{name_parts[1]}"
+            else:
+                filename = f"{filename}_{timestamp}"
+
+        return f"{folder}/{filename}"
+
     def upload_bytes(
-        self, content_bytes: bytes, folder: str, filename: str, content_type: str
+        self,
+        content_bytes: bytes,
+        folder: str,
+        filename: str,
+        content_type: str,
+        timestamped: bool = True,
     ) -> Optional[str]:
         """
         Upload bytes content to Firebase Storage with timestamped filename
@@ -55,6 +107,8 @@ class FirebaseService:
             folder: The folder path (e.g., 'content/worksheet')
             filename: Base filename (will be timestamped)
             content_type: MIME type of the content
+            timestamped: Append a timestamp to the filename; disable for stable,
+                content-addressed keys, which are written once and never overwritten
 
         Returns:
             Public URL if successful, None if failed
@@ -63,20 +117,141 @@ class FirebaseService:
             return None
 
         try:
-            # Generate timestamped filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            name_parts = filename.rsplit(".", 1) if "." in filename else [filename, ""]
-            if len(name_parts) == 2:
-                timestamped_filename = f"{name_parts[0]}_{timestamp}.{name_parts[1]}"
+            # Create full storage path
+            storage_path = self._build_storage_path(folder, filename, timestamped)
+
+            # Create a blob and upload
+            blob = self._bucket.blob(storage_path, chunk_size=UPLOAD_CHUNK_SIZE)
+            if timestamped:
+                blob.upload_from_string(
+                    content_bytes, content_type=content_type, retry=DEFAULT_RETRY
+                )
             else:
-                timestamped_filename = f"{filename}_{timestamp}"
+                # Stable names are content-addressed, so an existing blob already
+                # holds these bytes; only create it if it is missing
+                blob.cache_control = IMMUTABLE_CACHE_CONTROL
+                try:
+                    blob.upload_from_string(
+                        content_bytes,
+                        content_type=content_type,
+                        if_generation_match=0,
+                        retry=DEFAULT_RETRY,
+                    )
+                except PreconditionFailed:
+                    # Written by a retried attempt or a concurrent upload, which
+                    # may not have made it public yet; make_public is idempotent
+                    logger.info(f"File already exists at {storage_path}")
+                    blob.make_public()
+                    return blob.public_url
+
+            # Make the file publicly accessible
+            blob.make_public()
+
+            # Get the public URL
+            public_url = blob.public_url
+
+            logger.info(f"File uploaded successfully to {storage_path}")
+            logger.info(f"Public URL: {public_url}")
+
+            return public_url
+
+        except Exception as e:
+            logger.error(f"Error uploading file: {str(e)}")
+            return None
+
+    async def upload_bytes_async(
+        self,
+        content_bytes: bytes,
+        folder: str,
+        filename: str,
+        content_type: str,
+        timestamped: bool = True,
+    ) -> Optional[str]:
+        """Run upload_bytes in a worker thread so the event loop keeps serving requests"""
+        upload = partial(
+            self.upload_bytes,
+            content_bytes,
+            folder,
+            filename,
+            content_type,
+            timestamped,
+        )
+        if timestamped:
+            return await asyncio.to_thread(upload)
+
+        # Stable names are content-addressed, so concurrent uploads to the same
+        # path carry the same bytes; coalesce them into one upload
+        storage_path = self._build_storage_path(folder, filename, timestamped)
+        task = self._inflight_uploads.get(storage_path)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(upload))
+            self._inflight_uploads[storage_path] = task
+            task.add_done_callback(
+                lambda _: self._inflight_uploads.pop(storage_path, None)
+            )
+
+        # Shielded so one caller being cancelled does not cancel the others
+        return await asyncio.shield(task)
+
+    def upload_bytes_background(
+        self,
+        content_bytes: bytes,
+        folder: str,
+        filename: str,
+        content_type: str,
+        timestamped: bool = True,
+    ) -> Future:
+        """Queue upload_bytes on a background thread and return without waiting for it"""
+        # Rebuild after a fork; worker threads are not inherited by child processes
+        if self._upload_executor is None or self._upload_executor_pid != os.getpid():
+            self._upload_executor = ThreadPoolExecutor(
+                max_workers=BACKGROUND_UPLOAD_WORKERS,
+                thread_name_prefix="firebase-upload",
+            )
+            self._upload_executor_pid = os.getpid()
+
+        return self._upload_executor.submit(
+            self.upload_bytes,
+            content_bytes,
+            folder,
+            filename,
+            content_type,
+            timestamped,
+        )
+
+    def upload_fileobj(
+        self,
+        fileobj: IO[bytes],
+        folder: str,
+        filename: str,
+        content_type: str,
+        timestamped: bool = True,
+    ) -> Optional[str]:
+        """
+        Upload a file-like object to Firebase Storage without loading it into memory
+
+        Args:
+            fileobj: Readable binary file object (read from its start)
+            folder: The folder path (e.g., 'visual_aids/science')
+            filename: Base filename (will be timestamped)
+            content_type: MIME type of the content
+            timestamped: Append a timestamp to the filename (disable for stable keys)
+
+        Returns:
+            Public URL if successful, None if failed
+        """
+        if not self.initialize():
+            return None
 
+        try:
             # Create full storage path
-            storage_path = f"{folder}/{timestamped_filename}"
+            storage_path = self._build_storage_path(folder, filename, timestamped)
 
-            # Create a blob and upload
-            blob = self._bucket.blob(storage_path)
-            blob.upload_from_string(content_bytes, content_type=content_type)
+            # Create a blob and stream the file into it
+            blob = self._bucket.blob(storage_path, chunk_size=UPLOAD_CHUNK_SIZE)
+            blob.upload_from_file(
+                fileobj, content_type=content_type, rewind=True, retry=DEFAULT_RETRY
+            )
 
             # Make the file publicly accessible
             blob.make_public()
@@ -93,6 +268,63 @@ class FirebaseService:
             logger.error(f"Error uploading file: {str(e)}")
             return None
 
+    async def upload_fileobj_async(
+        self,
+        fileobj: IO[bytes],
+        folder: str,
+        filename: str,
+        content_type: str,
+        timestamped: bool = True,
+    ) -> Optional[str]:
+        """Run upload_fileobj in a worker thread so the event loop keeps serving requests"""
+        return await asyncio.to_thread(
+            self.upload_fileobj, fileobj, folder, filename, content_type, timestamped
+        )
+
+    def get_public_url(self, storage_path: str) -> Optional[str]:
+        """
+        Public URL a file at storage_path has (or will have) once uploaded
+
+        Args:
+            storage_path: Full storage path (e.g., 'content/quiz/<name>.pdf')
+
+        Returns:
+            Public URL, or None if Firebase is not available
+        """
+        if not self.initialize():
+            return None
+
+        # Derived from the bucket and path; no request is made
+        return self._bucket.blob(storage_path).public_url
+
+    def get_existing(self, storage_path: str) -> Optional[bytes]:
+        """
+        Fetch the content of an existing file in Firebase Storage
+
+        Args:
+            storage_path: Full storage path (e.g., 'pdf_cache/<key>.pdf')
+
+        Returns:
+            File content as bytes if it exists, None otherwise
+        """
+        if not self.initialize():
+            return None
+
+        try:
+            # Download directly; a separate exists() check costs another round trip
+            blob = self._bucket.blob(storage_path)
+            content = blob.download_as_bytes()
+
+            logger.info(f"Found existing file at {storage_path}")
+            return content
+
+        except NotFound:
+            return None
+
+        except Exception as e:
+            logger.error(f"Error fetching file: {str(e)}")
+            return None
+
 
 # Global instance
 firebase_service = FirebaseService()
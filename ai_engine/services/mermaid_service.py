@@ -1,10 +1,9 @@
-import io
 import base64
+import tempfile
 import zlib
 import logging
-import requests
-import json
-from typing import Optional
+import httpx
+from typing import IO, Optional, Tuple
 
 from .firebase_service import firebase_service
 
@@ -12,54 +11,105 @@ logger = logging.getLogger(__name__)
 
 # Configuration constant
 KROKI_SERVER = "https://kroki.io"
+# Sources shorter than this skip the POST+JSON envelope and use GET directly
+SMALL_DIAGRAM_THRESHOLD = 512
+# Keep encoded GET URLs within safe length limits
+MAX_GET_URL_LENGTH = 2000
 
+# Diagram bodies are streamed in chunks and spill to disk past this size
+STREAM_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
 
-def generate_diagram_image(
+# Shared client so concurrent Kroki requests multiplex over one HTTP/2 connection
+_client = httpx.AsyncClient(
+    http2=True,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
+
+
+async def close_client() -> None:
+    """Close the shared Kroki client and its pooled connections."""
+    await _client.aclose()
+
+
+async def _stream_to_file(
+    method: str, url: str, **kwargs
+) -> Tuple[int, Optional[IO[bytes]]]:
+    """Stream a Kroki response body into a spooled temporary file."""
+    async with _client.stream(method, url, **kwargs) as response:
+        if response.status_code != 200:
+            return response.status_code, None
+
+        image_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+            image_file.write(chunk)
+        image_file.seek(0)
+        return response.status_code, image_file
+
+
+async def generate_diagram_image(
     mermaid_syntax: str, output_format: str = "png"
-) -> Optional[bytes]:
+) -> Optional[IO[bytes]]:
     """
-    Convert Mermaid syntax to image bytes using Kroki API
+    Convert Mermaid syntax to an image using Kroki API
 
     Args:
         mermaid_syntax: The Mermaid code
         output_format: Output format (png, svg, pdf)
 
     Returns:
-        Image bytes if successful, None if failed
+        Spooled temporary file holding the image if successful, None if failed
     """
     try:
-        # First try POST request to /mermaid/format endpoint (simpler)
-        url = f"{KROKI_SERVER}/mermaid/{output_format}"
-        headers = {"Content-Type": "application/json"}
-        payload = {"diagram_source": mermaid_syntax}
-
-        response = requests.post(
-            url,
-            data=json.dumps(payload),
-            headers=headers,
-            timeout=30,
-        )
-
-        # If POST fails, try GET with proper deflate + base64 encoding
-        if response.status_code != 200:
-            logger.warning(
-                f"POST request failed with status {response.status_code}, trying GET request"
-            )
-
-            # Encode mermaid syntax using deflate + base64 (as required by Kroki)
-            compressed = zlib.compress(mermaid_syntax.encode("utf-8"), 9)
-            encoded_syntax = base64.urlsafe_b64encode(compressed).decode("ascii")
-
-            # Use GET endpoint with proper encoding
-            url = f"{KROKI_SERVER}/mermaid/{output_format}/{encoded_syntax}"
-            response = requests.get(url, timeout=30)
-
-        response.raise_for_status()
+        # Encode mermaid syntax using deflate + base64 (as required by Kroki)
+        compressed = zlib.compress(mermaid_syntax.encode("utf-8"), 9)
+        encoded_syntax = base64.urlsafe_b64encode(compressed).decode("ascii")
+        get_url = f"{KROKI_SERVER}/mermaid/{output_format}/{encoded_syntax}"
+
+        # Small diagrams go straight to the GET endpoint, skipping the JSON envelope
+        image_file = None
+        get_attempted = False
+        if (
+            len(mermaid_syntax) < SMALL_DIAGRAM_THRESHOLD
+            and len(encoded_syntax) <= MAX_GET_URL_LENGTH
+        ):
+            status_code, image_file = await _stream_to_file("GET", get_url)
+            get_attempted = True
+
+            if image_file is None:
+                logger.warning(
+                    f"GET request failed with status {status_code}, trying POST request"
+                )
+
+        if image_file is None:
+            # POST request to /mermaid/format endpoint
+            url = f"{KROKI_SERVER}/mermaid/{output_format}"
+            payload = {"diagram_source": mermaid_syntax}
+
+            status_code, image_file = await _stream_to_file("POST", url, json=payload)
+
+            # If POST fails, try GET with proper deflate + base64 encoding
+            if (
+                image_file is None
+                and not get_attempted
+                and len(encoded_syntax) <= MAX_GET_URL_LENGTH
+            ):
+                logger.warning(
+                    f"POST request failed with status {status_code}, trying GET request"
+                )
+
+                # Use GET endpoint with proper encoding
+                status_code, image_file = await _stream_to_file("GET", get_url)
+
+        if image_file is None:
+            logger.error(f"Kroki server returned status {status_code}")
+            return None
 
         logger.info(f"Successfully generated {output_format} diagram from Mermaid")
-        return response.content
+        return image_file
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error making request to Kroki server: {e}")
         return None
     except Exception as e:
@@ -67,7 +117,7 @@ def generate_diagram_image(
         return None
 
 
-def create_and_upload_diagram(
+async def create_and_upload_diagram(
     mermaid_syntax: str,
     title: str,
     subject: str = "general",
@@ -87,9 +137,9 @@ def create_and_upload_diagram(
     """
     try:
         # Generate the diagram image
-        image_bytes = generate_diagram_image(mermaid_syntax, output_format)
+        image_file = await generate_diagram_image(mermaid_syntax, output_format)
 
-        if not image_bytes:
+        if image_file is None:
             logger.error("Failed to generate diagram image")
             return None
 
@@ -104,13 +154,14 @@ def create_and_upload_diagram(
         # Set content type
         content_type = f"image/{output_format}"
 
-        # Upload to Firebase
-        public_url = firebase_service.upload_bytes(
-            content_bytes=image_bytes,
-            folder=folder,
-            filename=filename,
-            content_type=content_type,
-        )
+        # Upload to Firebase straight from the spooled file
+        with image_file:
+            public_url = await firebase_service.upload_fileobj_async(
+                fileobj=image_file,
+                folder=folder,
+                filename=filename,
+                content_type=content_type,
+            )
 
         if public_url:
             logger.info(f"Successfully uploaded diagram to: {public_url}")
@@ -1,203 +1,368 @@
 import io
+import os
+import asyncio
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from time import perf_counter
+from typing import List, Optional, Sequence, Union
 from datetime import datetime, timezone
-from weasyprint import HTML
+from weasyprint import CSS, HTML
 from weasyprint.text.fonts import FontConfiguration
+import jinja2
 import markdown
+from markupsafe import Markup
+from pydantic import BaseModel
 import re
 import html
 
+try:
+    from pdf2image import convert_from_bytes
+except ImportError:  # Thumbnails are optional; skip them without pdf2image
+    convert_from_bytes = None
+
 from ..models import WorksheetOutput, LessonPlanOutput, StudyMaterialOutput, QuizOutput
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Firebase folder holding rendered PDFs keyed by a hash of their input
+PDF_CACHE_FOLDER = "pdf_cache"
+
+# Resolution and JPEG quality ceiling for images embedded in PDFs
+PDF_IMAGE_DPI = 150
+PDF_JPEG_QUALITY = 85
+
+# Resolution of first-page preview images
+THUMBNAIL_DPI = 72
+
+# Font configuration and image cache shared across renders in this process
+_FONT_CONFIG = None
+_IMAGE_CACHE = {}
+
+
+def _get_font_config() -> FontConfiguration:
+    """Return the process-wide FontConfiguration, creating it on first use."""
+    global _FONT_CONFIG
+    if _FONT_CONFIG is None:
+        _FONT_CONFIG = FontConfiguration()
+    return _FONT_CONFIG
+
+
+# Process pool for CPU-bound WeasyPrint rendering, created on first use; by
+# default the cores are split between the server's worker processes
+PDF_POOL_WORKERS = int(
+    os.getenv(
+        "PDF_POOL_WORKERS",
+        max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))),
+    )
+)
+_PDF_POOL = None
+
+# Each worker renders a sample on start unless WEASYPRINT_WARMUP=0
+WEASYPRINT_WARMUP = os.getenv("WEASYPRINT_WARMUP", "1") == "1"
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Return the shared PDF process pool, creating it on first use."""
+    global _PDF_POOL
+    if _PDF_POOL is None:
+        _PDF_POOL = ProcessPoolExecutor(
+            max_workers=PDF_POOL_WORKERS,
+            initializer=_warm_up if WEASYPRINT_WARMUP else None,
+        )
+    return _PDF_POOL
+
+
+def start_pdf_pool() -> None:
+    """Spawn the PDF worker processes now rather than on the first render request."""
+    pool = _get_pdf_pool()
+    # Workers are launched on demand, so queue one trivial task per worker
+    for _ in range(PDF_POOL_WORKERS):
+        pool.submit(os.getpid)
+
+
+def shutdown_pdf_pool() -> None:
+    """Stop the PDF process pool, waiting for in-flight renders to finish."""
+    global _PDF_POOL
+    if _PDF_POOL is not None:
+        _PDF_POOL.shutdown(wait=True)
+        _PDF_POOL = None
+
+
+async def run_in_pdf_pool(func, *args):
+    """Run a PDF conversion function in the process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pdf_pool(), func, *args)
+
+
+# Shared document shell; stylesheets are applied at render time, not inlined
+_DOCUMENT_HEAD = """<!doctype html>
+<html>
+    <head>
+        <meta charset="utf-8">
+        <title>{title}</title>
+    </head>"""
+
+_HTML_FOOTER = """
+    </body>
+</html>"""
+
+
+# Shared markdown converter, reset between documents instead of rebuilt per call
+# Newlines are kept by the .markdown white-space rule, not turned into <br> tags
+_MD = markdown.Markdown(extensions=["fenced_code"])
+# Anything that could be markdown syntax; text without it skips the parser
+_MD_SNIFF = re.compile(r"[*_`#>\[\]\-<&]|\d+\.|\n\s*\n|^(?: {4}|\t)", re.MULTILINE)
+# Empty paragraphs and runs of line breaks only add boxes to the layout tree
+_REDUNDANT_MARKUP = re.compile(r"<p>\s*</p>\n?|(<br />\s*){2,}")
+# Newlines between block tags would become visible breaks under pre-line
+_BLOCK_TAG_NEWLINE = re.compile(r"(</?(?:p|ul|ol|li|h[1-6]|pre|blockquote|hr)\b[^>]*>)\n")
 
+
+@lru_cache(maxsize=512)
 def process_markdown_content(text: str) -> str:
     """Convert markdown text to HTML, handling common formatting and newlines."""
     if not text:
         return ""
 
-    # Initialize markdown with extensions for better formatting
-    md = markdown.Markdown(extensions=["nl2br", "fenced_code"])
+    # Plain prose renders the same as markdown would, without a parse pass
+    if not _MD_SNIFF.search(text):
+        return html.escape(text.strip(), quote=False)
 
     # Convert markdown to HTML
-    html = md.convert(text)
+    converted = _MD.reset().convert(text)
+
+    # Drop empty paragraphs and collapse consecutive line breaks
+    converted = _REDUNDANT_MARKUP.sub(
+        lambda m: "<br />\n" if m.group(1) else "", converted
+    )
 
-    # Remove outer <p> tags since we'll add our own structure
-    html = re.sub(r"^<p>(.*)</p>$", r"\1", html, flags=re.DOTALL)
+    converted = _BLOCK_TAG_NEWLINE.sub(r"\1", converted)
 
-    return html
+    # Remove the outer <p> of single-paragraph output since we add our own
+    # structure; multi-paragraph output keeps its tags balanced
+    if (
+        converted.startswith("<p>")
+        and converted.endswith("</p>")
+        and converted.count("<p>") == 1
+    ):
+        converted = converted[3:-4]
 
+    return converted
 
-def create_html_from_study_material(study_material: StudyMaterialOutput) -> str:
-    """Convert structured study material data to HTML."""
-    html_content = f"""<!doctype html>
-<html>
-    <head>
-        <meta charset="utf-8">
-        <title>{study_material.title}</title>
-        <style>
-            body {{
+
+_STUDY_CSS = """
+            body {
                 font-family: Arial, sans-serif;
                 margin: 40px;
                 line-height: 1.6;
                 color: #333;
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 border-bottom: 2px solid #333;
                 padding-bottom: 20px;
                 margin-bottom: 30px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #2c3e50;
                 margin: 0;
-            }}
-            .meta-info {{
+            }
+            .meta-info {
                 color: #7f8c8d;
                 margin: 5px 0;
-            }}
-            .overview {{
+            }
+            .overview {
                 background-color: #f8f9fa;
                 padding: 15px;
                 border-left: 4px solid #3498db;
                 margin: 20px 0;
-            }}
-            .overview p, .learning-objectives p, .key-concepts p, .practice-problems p {{
+            }
+            .overview p, .learning-objectives p, .key-concepts p, .practice-problems p {
                 margin: 8px 0;
-            }}
-            .overview strong, .learning-objectives strong, .key-concepts strong, .practice-problems strong {{
+            }
+            .overview strong, .learning-objectives strong, .key-concepts strong, .practice-problems strong {
                 font-weight: bold;
                 color: #2c3e50;
-            }}
-            .overview em, .learning-objectives em, .key-concepts em, .practice-problems em {{
+            }
+            .overview em, .learning-objectives em, .key-concepts em, .practice-problems em {
                 font-style: italic;
-            }}
-            .learning-objectives {{
+            }
+            .learning-objectives {
                 background-color: #e8f5e8;
                 padding: 15px;
                 border-left: 4px solid #27ae60;
                 margin: 20px 0;
-            }}
-            .section {{
+            }
+            .section {
                 margin: 30px 0;
                 padding: 20px;
                 border: 1px solid #e0e0e0;
                 border-radius: 5px;
-            }}
-            .section-title {{
+            }
+            .section-title {
                 color: #2c3e50;
                 margin-bottom: 15px;
                 border-bottom: 1px solid #bdc3c7;
                 padding-bottom: 5px;
-            }}
-            .section-content {{
+            }
+            .section-content {
                 margin: 15px 0;
                 text-align: justify;
-            }}
-            .section-content p {{
+            }
+            .section-content p {
                 margin: 10px 0;
-            }}
-            .section-content strong {{
+            }
+            .section-content strong {
                 font-weight: bold;
                 color: #2c3e50;
-            }}
-            .section-content em {{
+            }
+            .section-content em {
                 font-style: italic;
-            }}
-            .section-content ul, .section-content ol {{
+            }
+            .section-content ul, .section-content ol {
                 margin: 10px 0;
                 padding-left: 25px;
-            }}
-            .section-content li {{
+            }
+            .section-content li {
                 margin: 5px 0;
-            }}
-            .key-concepts {{
+            }
+            .key-concepts {
                 background-color: #fff3cd;
                 padding: 15px;
                 border-left: 4px solid #ffc107;
                 margin: 20px 0;
-            }}
-            .practice-problems {{
+            }
+            .practice-problems {
                 background-color: #f0f8ff;
                 padding: 15px;
                 border-left: 4px solid #17a2b8;
                 margin: 20px 0;
-            }}
-            .section-header {{
+            }
+            .section-header {
                 color: #2c3e50;
                 margin: 20px 0 10px 0;
-            }}
-        </style>
-    </head>
+            }
+            .markdown {
+                white-space: pre-line;
+            }
+"""
+# Parsed once at import and reused for every render
+_STUDY_STYLESHEET = CSS(string=_STUDY_CSS)
+
+_STUDY_CONTENT_HEADER = """
+        
+        <div class="section-header">
+            <h2>Study Content</h2>
+        </div>"""
+
+# Fixed scaffolding for each block, filled with str.format per document
+_STUDY_TITLE_HTML = """
     <body>
         <div class="header">
-            <h1>{study_material.title}</h1>
-            <div class="meta-info">Grade Level: {study_material.grade_level}</div>
-            <div class="meta-info">Subject: {study_material.subject}</div>
-        </div>
+            <h1>{title}</h1>
+            <div class="meta-info">Grade Level: {grade_level}</div>
+            <div class="meta-info">Subject: {subject}</div>
+        </div>"""
+
+_OVERVIEW_HTML = """
         
         <div class="overview">
             <h3>Overview</h3>
-            <div>{process_markdown_content(study_material.overview)}</div>
-        </div>
+            <div class="markdown">{body}</div>
+        </div>"""
+
+_LEARNING_OBJECTIVES_HTML = """
         
         <div class="learning-objectives">
             <h3>Learning Objectives</h3>
-            <div>{process_markdown_content(study_material.learning_objectives)}</div>
-        </div>
-        
-        <div class="section-header">
-            <h2>Study Content</h2>
+            <div class="markdown">{body}</div>
         </div>"""
 
-    # Add individual sections
-    for section in study_material.sections:
-        html_content += f"""
+_STUDY_SECTION_HTML = """
         <div class="section">
-            <h3 class="section-title">{section.section_title}</h3>
+            <h3 class="section-title">{title}</h3>
             <div class="section-content">
-                {process_markdown_content(section.content)}
+                <div class="markdown">{body}</div>
             </div>
         </div>"""
 
-    # Add key concepts if provided
-    if study_material.key_concepts:
-        html_content += f"""
+_KEY_CONCEPTS_HTML = """
         <div class="key-concepts">
             <h3>Key Concepts</h3>
-            <div>{process_markdown_content(study_material.key_concepts)}</div>
+            <div class="markdown">{body}</div>
         </div>"""
 
-    # Add practice problems if provided
-    if study_material.practice_problems:
-        html_content += f"""
+_PRACTICE_PROBLEMS_HTML = """
         <div class="practice-problems">
             <h3>Practice Problems</h3>
-            <div>{process_markdown_content(study_material.practice_problems)}</div>
+            <div class="markdown">{body}</div>
         </div>"""
 
-    html_content += """
-    </body>
-</html>"""
 
-    return html_content
+def create_html_from_study_material(study_material: StudyMaterialOutput) -> str:
+    """Convert structured study material data to HTML."""
+    title = html.escape(study_material.title)
+    parts = [
+        _DOCUMENT_HEAD.format_map({"title": title}),
+        _STUDY_TITLE_HTML.format(
+            title=title,
+            grade_level=html.escape(study_material.grade_level),
+            subject=html.escape(study_material.subject),
+        ),
+        _OVERVIEW_HTML.format(body=process_markdown_content(study_material.overview)),
+        _LEARNING_OBJECTIVES_HTML.format(
+            body=process_markdown_content(study_material.learning_objectives)
+        ),
+        _STUDY_CONTENT_HEADER,
+    ]
+
+    # Add individual sections
+    parts.extend(
+        _STUDY_SECTION_HTML.format(
+            title=html.escape(section.section_title),
+            body=process_markdown_content(section.content),
+        )
+        for section in study_material.sections
+    )
+
+    # Add key concepts if provided
+    if study_material.key_concepts:
+        parts.append(
+            _KEY_CONCEPTS_HTML.format(
+                body=process_markdown_content(study_material.key_concepts)
+            )
+        )
+
+    # Add practice problems if provided
+    if study_material.practice_problems:
+        parts.append(
+            _PRACTICE_PROBLEMS_HTML.format(
+                body=process_markdown_content(study_material.practice_problems)
+            )
+        )
+
+    parts.append(_HTML_FOOTER)
+
+    return "".join(parts)
+
+_QUIZ_CSS = """
+            body { font-family: Arial, sans-serif; padding: 20px; }
+            h1 { text-align: center; }
+            .question { margin-bottom: 20px; }
+            .question-type { font-style: italic; color: #555; }
+            .options { margin-top: 8px; }
+            .option { margin-left: 20px; }
+            .marks { color: #008000; font-weight: bold; }
+"""
+# Parsed once at import and reused for every render
+_QUIZ_STYLESHEET = CSS(string=_QUIZ_CSS)
+
 
 def create_html_from_quiz(quiz: QuizOutput) -> str:
-    html_parts = [
-        "<html>",
-        "<head><meta charset='UTF-8'><style>",
-        "body { font-family: Arial, sans-serif; padding: 20px; }",
-        "h1 { text-align: center; }",
-        ".question { margin-bottom: 20px; }",
-        ".question-type { font-style: italic; color: #555; }",
-        ".options { margin-top: 8px; }",
-        ".option { margin-left: 20px; }",
-        ".marks { color: #008000; font-weight: bold; }",
-        "</style></head><body>"
-    ]
+    html_parts = [_DOCUMENT_HEAD.format_map({"title": "Quiz"}), "<body>"]
 
     html_parts.append(f"<h1>Quiz</h1>")
     html_parts.append(f"<p><strong>Total Questions:</strong> {quiz.number_of_questions}</p>")
@@ -219,286 +384,375 @@ def create_html_from_quiz(quiz: QuizOutput) -> str:
     return "\n".join(html_parts)    
 
 
-def create_html_from_lesson_plan(lesson_plan: LessonPlanOutput) -> str:
-    """Convert structured lesson plan data to HTML."""
-    html_content = f"""<!doctype html>
-<html>
-    <head>
-        <meta charset="utf-8">
-        <title>{lesson_plan.title}</title>
-        <style>
-            body {{
+_LESSON_CSS = """
+            body {
                 font-family: Arial, sans-serif;
                 margin: 40px;
                 line-height: 1.6;
                 color: #333;
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 border-bottom: 2px solid #333;
                 padding-bottom: 20px;
                 margin-bottom: 30px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #2c3e50;
                 margin: 0;
-            }}
-            .meta-info {{
+            }
+            .meta-info {
                 color: #7f8c8d;
                 margin: 5px 0;
-            }}
-            .overview {{
+            }
+            .overview {
                 background-color: #f8f9fa;
                 padding: 15px;
                 border-left: 4px solid #3498db;
                 margin: 20px 0;
-            }}
-            .lesson {{
+            }
+            .lesson {
                 margin: 30px 0;
                 padding: 20px;
                 border: 1px solid #e0e0e0;
                 border-radius: 5px;
-            }}
-            .lesson-title {{
+            }
+            .lesson-title {
                 color: #2c3e50;
                 margin-bottom: 10px;
                 border-bottom: 1px solid #bdc3c7;
                 padding-bottom: 5px;
-            }}
-            .lesson-duration {{
+            }
+            .lesson-duration {
                 color: #27ae60;
                 font-weight: bold;
                 margin-bottom: 15px;
-            }}
-            .lesson-content {{
+            }
+            .lesson-content {
                 margin: 15px 0;
-            }}
-            .lesson-points {{
+            }
+            .lesson-points {
                 background-color: #f8f9fa;
                 padding: 10px;
                 border-radius: 3px;
                 margin-top: 15px;
-            }}
-            .section-header {{
+            }
+            .section-header {
                 color: #2c3e50;
                 margin: 20px 0 10px 0;
-            }}
-        </style>
-    </head>
+            }
+            .markdown {
+                white-space: pre-line;
+            }
+"""
+# Parsed once at import and reused for every render
+_LESSON_STYLESHEET = CSS(string=_LESSON_CSS)
+
+_LESSON_TITLE_HTML = """
     <body>
         <div class="header">
-            <h1>{lesson_plan.title}</h1>
-            <div class="meta-info">Grade Level: {lesson_plan.grade_level}</div>
-            <div class="meta-info">Total Duration: {lesson_plan.total_duration}</div>
+            <h1>{title}</h1>
+            <div class="meta-info">Grade Level: {grade_level}</div>
+            <div class="meta-info">Total Duration: {total_duration}</div>
         </div>
         
         <div class="section-header">
             <h2>Learning Goals</h2>
         </div>
-        <div>{process_markdown_content(lesson_plan.learning_goals)}</div>
+        <div class="markdown">{learning_goals}</div>
         
         <div class="overview">
             <h3>Overview</h3>
-            <div>{process_markdown_content(lesson_plan.overview)}</div>
-        </div>
+            <div class="markdown">{overview}</div>
+        </div>"""
+
+_LESSON_BREAKDOWN_HEADER = """
         
         <div class="section-header">
             <h2>Lesson Breakdown</h2>
         </div>"""
 
-    # Add individual lessons
-    for lesson in lesson_plan.lessons:
-        html_content += f"""
+_LESSON_HTML = """
         <div class="lesson">
-            <h3 class="lesson-title">Lesson {lesson.lesson_number}: {lesson.title}</h3>
-            <div class="lesson-duration">Duration: {lesson.duration}</div>
+            <h3 class="lesson-title">Lesson {number}: {title}</h3>
+            <div class="lesson-duration">Duration: {duration}</div>
             <div class="lesson-content">
                 <h4>Content & Activities:</h4>
-                <div>{process_markdown_content(lesson.content)}</div>
+                <div class="markdown">{content}</div>
             </div>
             <div class="lesson-points">
                 <h4>Key Learning Points:</h4>
-                <div>{process_markdown_content(lesson.key_learning_points)}</div>
+                <div class="markdown">{points}</div>
             </div>
         </div>"""
 
-    html_content += """
-    </body>
-</html>"""
 
-    return html_content
+def create_html_from_lesson_plan(lesson_plan: LessonPlanOutput) -> str:
+    """Convert structured lesson plan data to HTML."""
+    d = lesson_plan.model_dump()
+    title = html.escape(d["title"])
+    parts = [
+        _DOCUMENT_HEAD.format_map({"title": title}),
+        _LESSON_TITLE_HTML.format(
+            title=title,
+            grade_level=html.escape(d["grade_level"]),
+            total_duration=html.escape(d["total_duration"]),
+            learning_goals=process_markdown_content(d["learning_goals"]),
+            overview=process_markdown_content(d["overview"]),
+        ),
+        _LESSON_BREAKDOWN_HEADER,
+    ]
+
+    # Add individual lessons
+    parts.extend(
+        _LESSON_HTML.format(
+            number=lesson["lesson_number"],
+            title=html.escape(lesson["title"]),
+            duration=html.escape(lesson["duration"]),
+            content=process_markdown_content(lesson["content"]),
+            points=process_markdown_content(lesson["key_learning_points"]),
+        )
+        for lesson in d["lessons"]
+    )
 
+    parts.append(_HTML_FOOTER)
 
-def create_html_from_worksheet(worksheet: WorksheetOutput) -> str:
-    """Convert structured worksheet data to HTML."""
-    html_content = f"""<!doctype html>
-<html>
-    <head>
-        <meta charset="utf-8">
-        <title>{worksheet.title}</title>
-        <style>
-            body {{
+    return "".join(parts)
+
+
+_WORKSHEET_CSS = """
+            body {
                 font-family: Arial, sans-serif;
                 margin: 40px;
                 line-height: 1.6;
                 color: #333;
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 border-bottom: 2px solid #333;
                 padding-bottom: 20px;
                 margin-bottom: 30px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #2c3e50;
                 margin: 0;
-            }}
-            .grade-subject {{
+            }
+            .grade-subject {
                 color: #7f8c8d;
                 margin: 5px 0;
-            }}
-            .instructions {{
+            }
+            .instructions {
                 background-color: #f8f9fa;
                 padding: 15px;
                 border-left: 4px solid #3498db;
                 margin: 20px 0;
                 font-style: italic;
-            }}
-            .section {{
+            }
+            .section {
                 margin: 30px 0;
-            }}
-            .section-title {{
+            }
+            .answer-key {
+                margin-top: 50px;
+            }
+            .section-title {
                 color: #2c3e50;
                 border-bottom: 1px solid #bdc3c7;
                 padding-bottom: 5px;
                 margin-bottom: 15px;
-            }}
-            .question {{
+            }
+            .question {
                 margin: 15px 0;
                 padding: 10px 0;
-            }}
-            .question-number {{
+            }
+            .question-number {
                 font-weight: bold;
                 color: #2980b9;
-            }}
-            .answer-space {{
+            }
+            .answer-space {
                 border-bottom: 1px solid #333;
                 display: inline-block;
                 min-width: 200px;
                 margin: 0 5px;
-            }}
-            .short-answer-space {{
+            }
+            .short-answer-space {
                 border-bottom: 1px solid #333;
                 height: 60px;
                 margin: 10px 0;
                 width: 100%;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>{worksheet.title}</h1>
-            <div class="grade-subject">Grade {worksheet.grade_level} • {worksheet.subject}</div>
-            <div>Name: _________________________ Date: _____________</div>
-        </div>
+            }
+"""
+# Parsed once at import and reused for every render
+_WORKSHEET_STYLESHEET = CSS(string=_WORKSHEET_CSS)
+
+# Blank markers (runs of underscores or "[blank]") and their styled replacement
+_BLANK_RE = re.compile(r"_{3,}|\[blank\]")
+_ANSWER_SPACE = '<span class="answer-space"></span>'
+
+_WORKSHEET_FILL_IN_BLANKS_HEADER = """
         
         <div class="section">
             <h2 class="section-title">Part A: Fill in the Blanks</h2>"""
 
-    # Add fill-in-the-blank questions
-    for i, question in enumerate(worksheet.fill_in_blanks, 1):
-        # Replace common blank markers with styled blanks
-        question_text = question.question_text
-        for blank_marker in ["_____", "[blank]", "___"]:
-            question_text = question_text.replace(
-                blank_marker, '<span class="answer-space"></span>'
-            )
-
-        html_content += f"""
-            <div class="question">
-                <span class="question-number">{i}.</span> {question_text}
-            </div>"""
-
-    html_content += """
+_WORKSHEET_SHORT_ANSWERS_HEADER = """
         </div>
         
         <div class="section">
             <h2 class="section-title">Part B: Short Answer Questions</h2>"""
 
-    # Add short answer questions
-    for i, question in enumerate(worksheet.short_answers, 1):
-        html_content += f"""
-            <div class="question">
-                <div><span class="question-number">{i}.</span> {question.question}</div>
-                <div class="short-answer-space"></div>
-            </div>"""
+_WORKSHEET_QUESTIONS_FOOTER = """
+        </div>""" + _HTML_FOOTER
 
-    html_content += """
-        </div>
-        
-        <div class="section" style="page-break-before: always; margin-top: 50px;">
+# The answer key is its own document, so it always starts on a fresh page
+_WORKSHEET_ANSWER_KEY_HEADER = """
+    <body>
+        <div class="section answer-key">
             <h2 class="section-title">Answer Key</h2>
             
             <div style="margin: 20px 0;">
                 <h3 style="color: #2c3e50; margin-bottom: 10px;">Part A: Fill in the Blanks</h3>"""
 
-    # Add fill-in-the-blank answers
-    for i, question in enumerate(worksheet.fill_in_blanks, 1):
-        html_content += f"""
-                <div style="margin: 8px 0;">
-                    <span class="question-number">{i}.</span> {question.answer}
-                </div>"""
-
-    html_content += """
+_WORKSHEET_ANSWER_KEY_SHORT_ANSWERS_HEADER = """
             </div>
             
             <div style="margin: 20px 0;">
                 <h3 style="color: #2c3e50; margin-bottom: 10px;">Part B: Short Answer Questions</h3>"""
 
-    # Add short answer expected answers
-    for i, question in enumerate(worksheet.short_answers, 1):
-        html_content += f"""
+_WORKSHEET_FOOTER = """
+            </div>
+        </div>
+    </body>
+</html>"""
+
+
+@lru_cache(maxsize=512)
+def _fill_blanks(question_text: str) -> Markup:
+    """Escape a question and replace its blank markers with styled blanks."""
+    question_text = html.escape(question_text)
+    if "___" in question_text or "[blank]" in question_text:
+        question_text = _BLANK_RE.sub(_ANSWER_SPACE, question_text)
+    return Markup(question_text)
+
+
+_WORKSHEET_QUESTIONS_TEMPLATE_SRC = (
+    _DOCUMENT_HEAD.replace("{title}", "{{ w.title }}")
+    + """
+    <body>
+        <div class="header">
+            <h1>{{ w.title }}</h1>
+            <div class="grade-subject">Grade {{ w.grade_level }} • {{ w.subject }}</div>
+            <div>Name: _________________________ Date: _____________</div>
+        </div>"""
+    + _WORKSHEET_FILL_IN_BLANKS_HEADER
+    + """{% for q in w.fill_in_blanks %}
+            <div class="question">
+                <span class="question-number">{{ loop.index }}.</span> {{ q.question_text | fill_blanks }}
+            </div>{% endfor %}"""
+    + _WORKSHEET_SHORT_ANSWERS_HEADER
+    + """{% for q in w.short_answers %}
+            <div class="question">
+                <div><span class="question-number">{{ loop.index }}.</span> {{ q.question }}</div>
+                <div class="short-answer-space"></div>
+            </div>{% endfor %}"""
+    + _WORKSHEET_QUESTIONS_FOOTER
+)
+
+_WORKSHEET_ANSWERS_TEMPLATE_SRC = (
+    _DOCUMENT_HEAD.replace("{title}", "{{ w.title }} - Answer Key")
+    + _WORKSHEET_ANSWER_KEY_HEADER
+    + """{% for q in w.fill_in_blanks %}
+                <div style="margin: 8px 0;">
+                    <span class="question-number">{{ loop.index }}.</span> {{ q.answer }}
+                </div>{% endfor %}"""
+    + _WORKSHEET_ANSWER_KEY_SHORT_ANSWERS_HEADER
+    + """{% for q in w.short_answers %}
                 <div style="margin: 15px 0; padding: 10px; background-color: #f8f9fa; border-radius: 5px;">
                     <div style="font-weight: bold; margin-bottom: 5px;">
-                        <span class="question-number">{i}.</span> {question.question}
+                        <span class="question-number">{{ loop.index }}.</span> {{ q.question }}
                     </div>
                     <div style="color: #2c3e50; font-style: italic;">
-                        Expected Answer: {question.expected_answer}
+                        Expected Answer: {{ q.expected_answer }}
                     </div>
-                </div>"""
+                </div>{% endfor %}"""
+    + _WORKSHEET_FOOTER
+)
 
-    html_content += """
-            </div>
-        </div>
-    </body>
-</html>"""
+# Compiled once at import; autoescaping covers every interpolated field
+_JINJA_ENV = jinja2.Environment(autoescape=True)
+_JINJA_ENV.filters["fill_blanks"] = _fill_blanks
+_WORKSHEET_QUESTIONS_TEMPLATE = _JINJA_ENV.from_string(_WORKSHEET_QUESTIONS_TEMPLATE_SRC)
+_WORKSHEET_ANSWERS_TEMPLATE = _JINJA_ENV.from_string(_WORKSHEET_ANSWERS_TEMPLATE_SRC)
+
+
+def create_html_worksheet_questions(worksheet: WorksheetOutput) -> str:
+    """Convert the worksheet's questions to HTML."""
+    return _WORKSHEET_QUESTIONS_TEMPLATE.render(w=worksheet)
 
-    return html_content
 
+def create_html_worksheet_answers(worksheet: WorksheetOutput) -> str:
+    """Convert the worksheet's answer key to HTML."""
+    return _WORKSHEET_ANSWERS_TEMPLATE.render(w=worksheet)
 
-def html2pdf(html_content: str) -> io.BytesIO:
-    """Convert HTML content to PDF bytes."""
+
+def html2pdf(
+    html_content: Union[str, Sequence[str]],
+    stylesheets: Optional[List[CSS]] = None,
+) -> bytes:
+    """Convert HTML content to PDF bytes, applying any pre-parsed stylesheets.
+
+    A sequence of HTML documents is rendered into a single PDF, in order.
+    """
     start = perf_counter()
     try:
-        font_config = FontConfiguration()
-        bytes_io = io.BytesIO()
+        documents = [html_content] if isinstance(html_content, str) else html_content
+        rendered = [
+            HTML(string=content).render(
+                stylesheets=stylesheets,
+                font_config=_get_font_config(),
+                cache=_IMAGE_CACHE,
+                presentational_hints=False,
+            )
+            for content in documents
+        ]
+
+        # Stitch the laid-out pages together instead of laying out one big document
+        doc = rendered[0]
+        if len(rendered) > 1:
+            doc = doc.copy([page for part in rendered for page in part.pages])
 
-        doc = HTML(string=html_content).render(font_config=font_config)
         doc.metadata.authors = ["Worksheet Generator"]
         doc.metadata.created = datetime.now(timezone.utc).isoformat()
         doc.metadata.title = "Worksheet"
 
-        doc.write_pdf(bytes_io)
+        # With no target, write_pdf returns the PDF bytes directly; subset
+        # fonts without hinting, recompress images and keep streams compressed
+        # (pydyf also packs objects into a deflated object stream). Embedded
+        # images are capped at print resolution and re-encoded as JPEG
+        pdf_bytes = doc.write_pdf(
+            optimize_images=True,
+            jpeg_quality=PDF_JPEG_QUALITY,
+            dpi=PDF_IMAGE_DPI,
+            full_fonts=False,
+            hinting=False,
+            uncompressed_pdf=False,
+        )
 
         duration = perf_counter() - start
         logger.debug(f"PDF generation completed in {duration:.1f}s")
-        return bytes_io
+        return pdf_bytes
 
     except Exception as e:
         logger.error(f"Error in PDF generation: {e}")
         raise
 
 
+def pdf_cache_filename(content: BaseModel) -> str:
+    """Name of the PDF_CACHE_FOLDER entry holding the rendered PDF for content."""
+    cache_key = hashlib.blake2b(
+        content.model_dump_json().encode(), digest_size=16
+    ).hexdigest()
+    return f"{cache_key}.pdf"
+
+
 def lesson_plan_to_pdf_bytes(lesson_plan: LessonPlanOutput) -> bytes:
     """Converts a structured lesson plan to PDF bytes using WeasyPrint."""
     logger.info(
@@ -510,8 +764,7 @@ def lesson_plan_to_pdf_bytes(lesson_plan: LessonPlanOutput) -> bytes:
         html = create_html_from_lesson_plan(lesson_plan)
 
         # Convert HTML to PDF
-        pdf_bytes_io = html2pdf(html)
-        pdf_bytes = pdf_bytes_io.getvalue()
+        pdf_bytes = html2pdf(html, stylesheets=[_LESSON_STYLESHEET])
 
         logger.info(f"PDF conversion successful: {len(pdf_bytes)} bytes")
         return pdf_bytes
@@ -528,12 +781,14 @@ def worksheet_to_pdf_bytes(worksheet: WorksheetOutput) -> bytes:
     )
 
     try:
-        # Convert worksheet to HTML
-        html = create_html_from_worksheet(worksheet)
+        # Convert questions and answer key to separate HTML documents
+        documents = [
+            create_html_worksheet_questions(worksheet),
+            create_html_worksheet_answers(worksheet),
+        ]
 
-        # Convert HTML to PDF
-        pdf_bytes_io = html2pdf(html)
-        pdf_bytes = pdf_bytes_io.getvalue()
+        # Lay each out independently and merge the pages into one PDF
+        pdf_bytes = html2pdf(documents, stylesheets=[_WORKSHEET_STYLESHEET])
 
         logger.info(f"PDF conversion successful: {len(pdf_bytes)} bytes")
         return pdf_bytes
@@ -554,8 +809,7 @@ def study_material_to_pdf_bytes(study_material: StudyMaterialOutput) -> bytes:
         html = create_html_from_study_material(study_material)
 
         # Convert HTML to PDF
-        pdf_bytes_io = html2pdf(html)
-        pdf_bytes = pdf_bytes_io.getvalue()
+        pdf_bytes = html2pdf(html, stylesheets=[_STUDY_STYLESHEET])
 
         logger.info(f"PDF conversion successful: {len(pdf_bytes)} bytes")
         return pdf_bytes
@@ -577,8 +831,7 @@ def quiz_to_pdf_bytes(quiz: QuizOutput) -> bytes:
         html = create_html_from_quiz(quiz)
 
         # Convert HTML to PDF
-        pdf_bytes_io = html2pdf(html)
-        pdf_bytes = pdf_bytes_io.getvalue()
+        pdf_bytes = html2pdf(html, stylesheets=[_QUIZ_STYLESHEET])
 
         logger.info(f"PDF conversion successful: {len(pdf_bytes)} bytes")
         return pdf_bytes
@@ -586,3 +839,47 @@ def quiz_to_pdf_bytes(quiz: QuizOutput) -> bytes:
     except Exception as e:
         logger.error(f"Error converting quiz to PDF: {e}")
         raise
+
+
+def render_first_page_png(pdf_bytes: bytes) -> Optional[bytes]:
+    """Render the first page of a PDF as a PNG preview, or None if unavailable."""
+    if convert_from_bytes is None:
+        return None
+
+    try:
+        pages = convert_from_bytes(
+            pdf_bytes, dpi=THUMBNAIL_DPI, first_page=1, last_page=1, fmt="png"
+        )
+        buffer = io.BytesIO()
+        pages[0].save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    except Exception as e:
+        logger.warning(f"Error rendering PDF thumbnail: {e}")
+        return None
+
+
+def _warm_up() -> None:
+    """Render a tiny PDF so the first request doesn't pay WeasyPrint's cold-start cost."""
+    start = perf_counter()
+    try:
+        # Lay out a sample with each stylesheet so the fonts they use are
+        # loaded, and run markdown once to initialise its extensions
+        body = process_markdown_content("**x** *x*")
+        sample = f"<html><body><h1>x</h1>{body}</body></html>"
+        stylesheets = (
+            _WORKSHEET_STYLESHEET,
+            _LESSON_STYLESHEET,
+            _STUDY_STYLESHEET,
+            _QUIZ_STYLESHEET,
+        )
+        for stylesheet in stylesheets:
+            # Write each one too, so its fonts are also subset and embedded once
+            HTML(string=sample).render(
+                stylesheets=[stylesheet],
+                font_config=_get_font_config(),
+                cache=_IMAGE_CACHE,
+            ).write_pdf()
+        logger.debug(f"WeasyPrint warm-up completed in {perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.warning(f"WeasyPrint warm-up failed: {e}")
@@ -1,4 +1,3 @@
-import os
 # from google.cloud import documentai_v1beta3 as documentai
 from google.cloud import documentai_v1 as documentai
 
@@ -6,28 +5,46 @@ from google.cloud import storage
 from google.cloud import aiplatform
 import google.generativeai as genai
 import json
+import orjson
 from difflib import SequenceMatcher
-from dotenv import load_dotenv
+from functools import lru_cache
+from ai_engine.config import get_settings
 from google.genai.types import HttpOptions
 import re
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+settings = get_settings()
+genai.configure(api_key=settings.google_api_key)
 model = genai.GenerativeModel('gemini-2.0-flash')
-PROJECT_ID=os.getenv("PROJECT_ID")
-LOCATION=os.getenv("LOCATION")
-PROCESSOR_ID=os.getenv("PROCESSOR_ID")
+PROJECT_ID=settings.project_id
+LOCATION=settings.location
+PROCESSOR_ID=settings.processor_id
+# Code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"```|'''")
 
 from google.api_core.client_options import ClientOptions
 from google.cloud import documentai
 
 
+@lru_cache(maxsize=1)
+def _get_docai_client(location):
+    """Build the regional Document AI client once and reuse its channel."""
+    return documentai.DocumentProcessorServiceClient(
+        client_options=ClientOptions(api_endpoint=f"{location}-documentai.googleapis.com")
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_processor_name(project_id, location, processor_id):
+    """Format the processor resource name once per processor."""
+    return documentai.DocumentProcessorServiceClient.processor_path(project_id, location, processor_id)
+
+
 def extract_text_from_pdf_with_docai(file_path, project_id, location, processor_id, mime_type="application/pdf"):
     """
     Extracts text from a PDF file using Google Cloud Document AI.
 
     Args:
-        file_path (str): Path to the input PDF.
+        file_path (str): Path to the input PDF, or a gs:// URI of a PDF already in Cloud Storage.
         project_id (str): Google Cloud project ID (alphanumeric).
         location (str): Region where the processor is deployed (e.g., 'us').
         processor_id (str): The processor ID from Document AI Console.
@@ -37,23 +54,26 @@ def extract_text_from_pdf_with_docai(file_path, project_id, location, processor_
         str: Extracted text from the document.
     """
 
-    # Initialize the Document AI client with regional endpoint
-    client = documentai.DocumentProcessorServiceClient(
-        client_options=ClientOptions(api_endpoint=f"{location}-documentai.googleapis.com")
-    )
+    # Reuse the Document AI client for the regional endpoint
+    client = _get_docai_client(location)
 
     # Construct the full resource name for the processor
-    resource_name = client.processor_path(project_id, location, processor_id)
+    resource_name = _get_processor_name(project_id, location, processor_id)
 
-    # Read the PDF file into memory
-    with open(file_path, "rb") as f:
-        file_content = f.read()
+    if file_path.startswith("gs://"):
+        # Let Document AI read the file from Cloud Storage; the bytes never pass through here
+        gcs_document = documentai.GcsDocument(gcs_uri=file_path, mime_type=mime_type)
+        request = documentai.ProcessRequest(name=resource_name, gcs_document=gcs_document)
+    else:
+        # Read the PDF file into memory
+        with open(file_path, "rb") as f:
+            file_content = f.read()
 
-    # Create the RawDocument object
-    raw_document = documentai.RawDocument(content=file_content, mime_type=mime_type)
+        # Create the RawDocument object
+        raw_document = documentai.RawDocument(content=file_content, mime_type=mime_type)
 
-    # Build the request
-    request = documentai.ProcessRequest(name=resource_name, raw_document=raw_document)
+        # Build the request
+        request = documentai.ProcessRequest(name=resource_name, raw_document=raw_document)
 
     # Process the document
     result = client.process_document(request=request)
@@ -65,15 +85,8 @@ def extract_text_from_pdf_with_docai(file_path, project_id, location, processor_
 # The local file in your current working directory
 
 
-def extract_quiz_answers_from_text(raw_text: str) -> str:
-    """
-    Extract quiz answers from raw submission text using Gemini.
-    Returns JSON-like structured data as a string.
-    """
-
-    model = genai.GenerativeModel("gemini-2.0-flash")
-
-    prompt = f"""
+# Static instructions and schema for answer extraction; the submission is appended
+_ANSWER_EXTRACTION_PROMPT = """
         Extract the quiz answers from the student's submission below.
 
         STRICTLY format the output as a JSON array of objects with the following schema:
@@ -86,69 +99,112 @@ def extract_quiz_answers_from_text(raw_text: str) -> str:
         - "question_text": string
 
         JSON Schema:
-        {{
+        {
         "type": "array",
-        "items": {{
+        "items": {
             "type": "object",
-            "properties": {{
-            "question_no": {{ "type": "integer" }},
-            "question_text": {{ "type": "string" }},
-            "answer": {{
+            "properties": {
+            "question_no": { "type": "integer" },
+            "question_text": { "type": "string" },
+            "answer": {
                 "type": "array",
-                "items": {{ "type": "string" }}
-            }}
-            }},
+                "items": { "type": "string" }
+            }
+            },
             "required": ["question_no", "answer"]
-        }}
-        }}
+        }
+        }
 
         Submission:
-        {raw_text}
         """
 
 
+def extract_quiz_answers_from_text(raw_text: str) -> str:
+    """
+    Extract quiz answers from raw submission text using Gemini.
+    Returns JSON-like structured data as a string.
+    """
+
+    prompt = _ANSWER_EXTRACTION_PROMPT + raw_text
+
+
     response = model.generate_content(prompt)
     # response= extract_json_if_needed(response)
 
     print("response", response)
     try:
-        json_start = response.text.find('[')
-        json_text = response.text[json_start:].strip()
-        json_text = json_text.replace("```","").replace("'''","")
-        #json_text = extract_json_if_needed(response)
-        return json.loads(json_text)
+        # Slice the array itself so code fences around it never reach the parser
+        text = response.text
+        # Start inside a ```json block when there is one, so brackets in any
+        # preamble before it are skipped
+        fence_start = text.find("```json")
+        json_start = text.find('[', fence_start + 7 if fence_start != -1 else 0)
+        json_end = text.rfind(']') + 1
+        try:
+            return orjson.loads(text[json_start:json_end].encode())
+        except orjson.JSONDecodeError:
+            json_text = text[json_start:].strip()
+            json_text = _FENCE_RE.sub("", json_text)
+            #json_text = extract_json_if_needed(response)
+            return json.loads(json_text)
     except Exception as e:
         raise ValueError(f"Failed to parse JSON from model response: {e}\nRaw output:\n{response.text}")
 
 
-def evaluate_quiz(student_json: list, evaluation_json: list) -> dict:
+def prepare_evaluation(evaluation_json: list) -> list:
+    """
+    Normalizes the correct answers of an evaluation once so the same rubric
+    can grade many submissions without redoing the work.
+    """
+    prepared = []
+    for eval_q in evaluation_json:
+        correct_answers = [a.strip().lower() for a in eval_q.get("correct_answer", [])]
+        prepared.append({
+            "question_no": eval_q["question_no"],
+            "question_text": eval_q.get("question_text", ""),
+            "marks": eval_q.get("marks", 0),
+            "correct_answer": correct_answers,
+            "correct_set": frozenset(correct_answers),
+        })
+    return prepared
+
+
+def evaluate_quiz(student_json: list, evaluation_json: list, prepared: list = None) -> dict:
     """
     Evaluates student answers against correct answers and returns:
     - awarded marks per question
     - total possible marks
     - total scored marks
     - total marks for each question from evaluation_json
+
+    Pass the output of prepare_evaluation as `prepared` when grading several
+    submissions against the same evaluation_json.
     """
     results = []
     total_possible = 0
     total_scored = 0
 
-    # Create a lookup for evaluation questions by question_no
-    eval_lookup = {q["question_no"]: q for q in evaluation_json}
+    if prepared is None:
+        prepared = prepare_evaluation(evaluation_json)
 
-    for eval_q in evaluation_json:
+    # Index student answers by question_no once; the first answer for a question wins
+    student_lookup = {}
+    for q in student_json:
+        student_lookup.setdefault(q.get("question_no"), q)
+
+    for eval_q in prepared:
         q_no = eval_q["question_no"]
-        correct_answers = [a.strip().lower() for a in eval_q.get("correct_answer", [])]
-        marks = eval_q.get("marks", 0)
+        correct_set = eval_q["correct_set"]
+        marks = eval_q["marks"]
         total_possible += marks
 
         # Find the corresponding student answer
-        student_q = next((q for q in student_json if q.get("question_no") == q_no), None)
+        student_q = student_lookup.get(q_no)
         student_answers = [a.strip().lower() for a in student_q.get("answer", [])] if student_q else []
 
-        correct_matches = [a for a in student_answers if a in correct_answers]
+        correct_matches = [a for a in student_answers if a in correct_set]
 
-        if set(correct_matches) == set(correct_answers):
+        if set(correct_matches) == correct_set:
             awarded = marks
             status = "correct"
         elif correct_matches:
@@ -162,12 +218,12 @@ def evaluate_quiz(student_json: list, evaluation_json: list) -> dict:
 
         results.append({
             "question_no": q_no,
-            "question_text": eval_q.get("question_text", ""),
+            "question_text": eval_q["question_text"],
             "total_marks": marks,
             "awarded_marks": awarded,
             "status": status,
             "student_answer": student_answers,
-            "correct_answer": correct_answers
+            "correct_answer": eval_q["correct_answer"]
         })
 
     return {
@@ -1,14 +1,29 @@
 import os
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import Response
+import re
+from fastapi import (
+    FastAPI,
+    File,
+    UploadFile,
+    Form,
+    HTTPException,
+    Request,
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
 import asyncio
+import hashlib
 import logging
-import base64
+import orjson
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
 
 
-from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+from ai_engine.config import get_settings
 from ai_engine.agents.worksheet_agent import generate_worksheet_from_image
 from ai_engine.agents.lesson_planner_agent import generate_lesson_plan
 from ai_engine.agents.study_material_agent import generate_study_material
@@ -26,10 +41,19 @@ from ai_engine.services.pdf_service import (
     lesson_plan_to_pdf_bytes,
     study_material_to_pdf_bytes,
     quiz_to_pdf_bytes,
+    render_first_page_png,
+    pdf_cache_filename,
+    PDF_CACHE_FOLDER,
+    run_in_pdf_pool,
+    start_pdf_pool,
+    shutdown_pdf_pool,
 )
 from ai_engine.services.firebase_service import firebase_service
+from ai_engine.services.mermaid_service import close_client as close_kroki_client
+from ai_engine.services.cache_service import cache_service, make_key
 from ai_engine.models import (
     WorksheetRequest,
+    ContentRequest,
     LessonPlanRequest,
     StudyMaterialRequest,
     AskSahayakRequest,
@@ -37,10 +61,10 @@ from ai_engine.models import (
     VisualAidRequest,
 )
 
-load_dotenv()
-PROJECT_ID = os.getenv("PROJECT_ID")
-LOCATION = os.getenv("LOCATION")
-PROCESSOR_ID = os.getenv("PROCESSOR_ID")
+settings = get_settings()
+PROJECT_ID = settings.project_id
+LOCATION = settings.location
+PROCESSOR_ID = settings.processor_id
 
 # Configure logging
 logging.basicConfig(
@@ -48,24 +72,296 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+# Cap on concurrent LLM calls; excess requests wait their turn instead of
+# fanning out into quota errors
+GENERATION_SEMAPHORE = asyncio.Semaphore(
+    int(os.getenv("MAX_CONCURRENT_GENERATIONS", "8"))
+)
+
+# Largest image accepted by the worksheet endpoints
+MAX_IMAGE_SIZE = 25 * 1024 * 1024
+# Largest JSON worksheet body: the base64-encoded image plus the other fields
+MAX_WORKSHEET_BODY_SIZE = MAX_IMAGE_SIZE * 4 // 3 + 64 * 1024
+
+# Storage folder recording each worksheet response under its request hash, so
+# retries are answered from storage even after the response cache is gone
+WORKSHEET_RESULTS_FOLDER = "content/worksheet/results"
+
+# Threads available to asyncio.to_thread for blocking calls such as Firebase uploads
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+
+# Uploads whose URL was already returned; owned by the app rather than one
+# request, so they finish even if that request is cancelled
+_DEFERRED_UPLOADS = set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up shared executors on start; release workers and connections on stop."""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io"
+        )
+    )
+    start_pdf_pool()
+    # Load credentials and build the storage client now, after the PDF workers
+    # have forked, so the first upload is only the upload itself
+    await asyncio.to_thread(firebase_service.initialize)
+    yield
+    # Let deferred uploads finish; their URLs have already been handed out
+    await asyncio.gather(*_DEFERRED_UPLOADS, return_exceptions=True)
+    shutdown_pdf_pool()
+    await close_kroki_client()
+    await cache_service.close()
+
+
 app = FastAPI(
     title="Sahayak API",
     description="AI generation backend for Sahayak, a platform for empowering teachers in multi-grade classrooms",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
+# Content types of uploaded PDFs and of the JSON bodies returned pre-encoded
+PDF_CONTENT_TYPE = "application/pdf"
+JSON_CONTENT_TYPE = "application/json"
+
+# Runs of whitespace and ASCII punctuation become one underscore, so characters
+# such as "/" cannot add path segments to storage filenames
+_SLUG_RE = re.compile(r"[\s!-/:-@\[-`{-~]+")
+
+
+@lru_cache(maxsize=1024)
+def _slug(text: str) -> str:
+    """Turn a subject into a filename-safe slug; subjects repeat, so results are cached."""
+    return _SLUG_RE.sub("_", text.lower()).strip("_")
+
+
+def _content_digest(output: BaseModel) -> str:
+    """Short hash of generated content, used to name its PDF so re-uploads are no-ops."""
+    return hashlib.blake2b(output.model_dump_json().encode(), digest_size=8).hexdigest()
+
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Log and report errors raised outside the endpoints' own error handling."""
+    logger.error(
+        "Unhandled error on %s %s: %s",
+        request.method,
+        request.url.path,
+        exc,
+        exc_info=exc,
+    )
+    return ORJSONResponse(
+        status_code=500, content={"detail": f"Internal server error: {str(exc)}"}
+    )
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
     return {"message": "Sahayak API is running"}
 
 
-@app.post("/generate_worksheet_from_image")
-async def generate_worksheet_from_image_endpoint(request: WorksheetRequest):
+async def _read_body_capped(http_request: Request, limit: int) -> bytearray:
+    """Read a request body, rejecting it with a 413 as soon as it exceeds limit."""
+    content_length = http_request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        logger.warning("Request body too large: %s bytes", content_length)
+        raise HTTPException(
+            status_code=413, detail=f"Request body exceeds {limit} bytes"
+        )
+
+    # Content-Length may be absent (chunked) or wrong, so cap while reading too
+    body = bytearray()
+    async for chunk in http_request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            logger.warning("Request body too large: over %s bytes", limit)
+            raise HTTPException(
+                status_code=413, detail=f"Request body exceeds {limit} bytes"
+            )
+    return body
+
+
+async def _upload_thumbnail(
+    pdf_bytes: bytes, folder: str, filename: str
+) -> Optional[str]:
+    """Upload a first-page PNG preview of a PDF; None if it could not be made."""
+    thumbnail = await asyncio.to_thread(render_first_page_png, pdf_bytes)
+    if thumbnail is None:
+        return None
+
+    return await firebase_service.upload_bytes_async(
+        content_bytes=thumbnail,
+        folder=folder,
+        filename=f"{filename}_thumbnail.png",
+        content_type="image/png",
+        timestamped=False,
+    )
+
+
+async def _serve_cached(
+    cache_key: str, label: str, produce: Callable[[], Awaitable[bytes]]
+) -> Response:
+    """Serve a generated result as JSON, producing it only when it is not cached.
+
+    Identical requests reuse the cached result; concurrent identical requests
+    that miss share one produce() call instead of each generating their own.
+    produce() returns the encoded response and is responsible for caching it.
+    """
+    cached = await cache_service.get(cache_key)
+    if cached:
+        logger.info("Returning cached %s", label)
+        return Response(content=cached, media_type=JSON_CONTENT_TYPE)
+
+    response_json = await cache_service.single_flight(cache_key, produce)
+    return Response(content=response_json, media_type=JSON_CONTENT_TYPE)
+
+
+async def _generate_worksheet(
+    image_bytes: bytes,
+    image_filename: str,
+    grade: str,
+    subject: str,
+    topic: Optional[str] = None,
+    description: Optional[str] = None,
+):
+    """Generate, render and upload a worksheet for an already-decoded image."""
+    try:
+        if len(image_bytes) == 0:
+            logger.warning("Empty image data received")
+            raise HTTPException(status_code=400, detail="Empty image data")
+
+        # The endpoints cap the request size; this enforces the exact image limit
+        if len(image_bytes) > MAX_IMAGE_SIZE:
+            logger.warning("Image too large: %s bytes", len(image_bytes))
+            raise HTTPException(
+                status_code=413,
+                detail=f"Image exceeds the maximum size of {MAX_IMAGE_SIZE} bytes",
+            )
+
+        cache_key = make_key(
+            "worksheet", image_bytes, grade, subject, topic, description
+        )
+        result_filename = f"{cache_key.partition(':')[2]}.json"
+
+        async def produce():
+            stored = await asyncio.to_thread(
+                firebase_service.get_existing,
+                f"{WORKSHEET_RESULTS_FOLDER}/{result_filename}",
+            )
+            if stored is not None:
+                logger.info("Returning stored worksheet")
+                await cache_service.set(cache_key, stored.decode())
+                return stored
+
+            logger.info(
+                "Processing image: %s, size: %s bytes",
+                image_filename,
+                len(image_bytes),
+            )
+
+            # Generate worksheet using the service
+            async with GENERATION_SEMAPHORE:
+                worksheet = await generate_worksheet_from_image(
+                    image_bytes=image_bytes,
+                    grade=grade,
+                    filename=image_filename,
+                    subject=subject,
+                    topic=topic,
+                    description=description,
+                )
+
+            # Convert to PDF
+            pdf_bytes = await run_in_pdf_pool(worksheet_to_pdf_bytes, worksheet)
+
+            logger.info("Successfully generated worksheet PDF for grade %s", grade)
+
+            # Upload to Firebase Storage
+            subject_part = f"_{_slug(subject)}" if subject else ""
+            digest = _content_digest(worksheet)
+            base_name = f"worksheet{subject_part}_grade_{grade}_{digest}"
+            # Render the first-page preview while the PDF uploads
+            firebase_url, thumbnail_url = await asyncio.gather(
+                firebase_service.upload_bytes_async(
+                    content_bytes=pdf_bytes,
+                    folder="content/worksheet",
+                    filename=f"{base_name}.pdf",
+                    content_type=PDF_CONTENT_TYPE,
+                    timestamped=False,
+                ),
+                _upload_thumbnail(
+                    pdf_bytes, folder="content/worksheet", filename=base_name
+                ),
+            )
+
+            if not firebase_url:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to upload worksheet to Firebase Storage",
+                )
+
+            logger.info("Worksheet uploaded to Firebase: %s", firebase_url)
+
+            # Return JSON response with the URL
+            response = {
+                "success": True,
+                "message": f"Worksheet generated successfully for grade {grade}",
+                "url": firebase_url,
+                "thumbnail_url": thumbnail_url,
+                "type": "worksheet",
+                "grade": grade,
+                "subject": subject,
+                "topic": topic,
+            }
+            # Encoded once for the cache, the stored record and the response body
+            response_json = orjson.dumps(response)
+            await cache_service.set(cache_key, response_json.decode())
+            # Written once; a concurrent identical request finds the object present
+            firebase_service.upload_bytes_background(
+                content_bytes=response_json,
+                folder=WORKSHEET_RESULTS_FOLDER,
+                filename=result_filename,
+                content_type=JSON_CONTENT_TYPE,
+                timestamped=False,
+            )
+
+            return response_json
+
+        return await _serve_cached(cache_key, "worksheet", produce)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error generating worksheet: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate worksheet: {str(e)}"
+        )
+
+
+@app.post(
+    "/generate_worksheet_from_image",
+    deprecated=True,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": WorksheetRequest.model_json_schema()}
+            },
+        }
+    },
+)
+async def generate_worksheet_from_image_endpoint(http_request: Request):
     """
     Generate a worksheet PDF from a textbook image for a specific grade level.
 
+    Kept for existing clients; prefer /generate_worksheet_from_image_upload, which
+    takes the image as a multipart file and avoids the base64 overhead.
+
     - **image_base64**: Base64 encoded image data (PNG, JPG, or JPEG)
     - **image_filename**: Original filename (optional, defaults to "image.png")
     - **grade**: Grade level for the worksheet (1-12)
@@ -75,75 +371,239 @@ async def generate_worksheet_from_image_endpoint(request: WorksheetRequest):
 
     Returns: JSON response with the Firebase URL of the generated worksheet PDF
     """
+    # The body carries a multi-MB image, so validate the raw JSON in a single
+    # pydantic-core pass instead of json.loads followed by dict validation; that
+    # pass includes the base64 decode, so it runs in a worker thread
     try:
-        logger.info(f"Received request to generate worksheet for grade {request.grade}")
+        body = await _read_body_capped(http_request, MAX_WORKSHEET_BODY_SIZE)
+        request = await asyncio.to_thread(WorksheetRequest.model_validate_json, body)
+        # Drop the base64 text now rather than holding it through generation
+        del body
+    except ValidationError as e:
+        # The input is the raw body buffer, which is neither small nor
+        # JSON-encodable, so it is left out of the error detail
+        errors = e.errors(include_url=False, include_input=False)
+        for err in errors:
+            if err["type"] == "bytes_invalid_encoding":
+                logger.warning("Invalid base64 image data: %s", err["msg"])
+                raise HTTPException(status_code=400, detail="Invalid base64 image data")
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in errors]
+        )
 
-        # Decode base64 image
-        try:
-            image_bytes = base64.b64decode(request.image_base64)
-        except Exception as e:
-            logger.warning(f"Invalid base64 image data: {str(e)}")
-            raise HTTPException(status_code=400, detail="Invalid base64 image data")
+    logger.info("Received request to generate worksheet for grade %s", request.grade)
+
+    # image_base64 arrives already decoded; it was base64-decoded while
+    # the body was validated, so invalid data was rejected with a 400
+    return await _generate_worksheet(
+        image_bytes=request.image_base64,
+        image_filename=request.image_filename,
+        grade=request.grade,
+        subject=request.subject,
+        topic=request.topic,
+        description=request.description,
+    )
+
+
+@app.post("/generate_worksheet_from_image_upload")
+async def generate_worksheet_from_image_upload_endpoint(
+    image: UploadFile = File(...),
+    grade: str = Form(...),
+    subject: str = Form(...),
+    topic: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+):
+    """
+    Generate a worksheet PDF from a textbook image sent as a multipart file upload.
 
-        if len(image_bytes) == 0:
-            logger.warning("Empty image data received")
-            raise HTTPException(status_code=400, detail="Empty image data")
+    Same as /generate_worksheet_from_image, but the image is sent as raw bytes,
+    which avoids the base64 overhead on the wire and the decode step.
 
-        logger.info(
-            f"Processing image: {request.image_filename}, size: {len(image_bytes)} bytes"
-        )
+    - **image**: The image file (PNG, JPG, or JPEG)
+    - **grade**: Grade level for the worksheet (1-12)
+    - **subject**: Subject area (e.g., Math, Science, History)
+    - **topic**: Specific topic (optional)
+    - **description**: Additional instructions or requirements (optional)
 
-        # Generate worksheet using the service
-        worksheet = await generate_worksheet_from_image(
-            image_bytes=image_bytes,
-            grade=request.grade,
-            filename=request.image_filename,
-            subject=request.subject,
-            topic=request.topic,
-            description=request.description,
-        )
+    Returns: JSON response with the Firebase URL of the generated worksheet PDF
+    """
+    logger.info("Received upload request to generate worksheet for grade %s", grade)
 
-        # Convert to PDF
-        pdf_bytes = worksheet_to_pdf_bytes(worksheet)
+    # Reject non-images and oversized uploads before reading them into memory
+    if image.content_type and not image.content_type.startswith("image/"):
+        logger.warning("Unsupported upload type: %s", image.content_type)
+        raise HTTPException(
+            status_code=415, detail=f"Unsupported image type: {image.content_type}"
+        )
 
-        logger.info(f"Successfully generated worksheet PDF for grade {request.grade}")
+    if image.size is not None and image.size > MAX_IMAGE_SIZE:
+        logger.warning("Image too large: %s bytes", image.size)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image exceeds the maximum size of {MAX_IMAGE_SIZE} bytes",
+        )
 
-        # Upload to Firebase Storage
-        subject_part = (
-            f"_{request.subject.lower().replace(' ', '_')}" if request.subject else ""
+    # Read straight from the spooled upload; this is the only copy of the image
+    image_bytes = await image.read()
+
+    return await _generate_worksheet(
+        image_bytes=image_bytes,
+        image_filename=image.filename or "image.png",
+        grade=grade,
+        subject=subject,
+        topic=topic,
+        description=description,
+    )
+
+
+async def _upload_and_cache(
+    pdf_bytes: bytes, folder: str, filename: str, cache_key: str, response_json: bytes
+) -> None:
+    """Upload a PDF whose URL was already returned, caching the response once it exists."""
+    firebase_url = await firebase_service.upload_bytes_async(
+        content_bytes=pdf_bytes,
+        folder=folder,
+        filename=filename,
+        content_type=PDF_CONTENT_TYPE,
+        timestamped=False,
+    )
+    if not firebase_url:
+        logger.error("Background upload failed for %s/%s", folder, filename)
+        return
+
+    logger.info("Uploaded to Firebase in background: %s", firebase_url)
+    await cache_service.set(cache_key, response_json.decode())
+
+
+async def _run_content_pipeline(
+    content_type: str,
+    label: str,
+    request: ContentRequest,
+    generate: Callable[..., Awaitable[BaseModel]],
+    to_pdf: Callable[[BaseModel], bytes],
+    extra_fields: Optional[Callable[[BaseModel], dict]] = None,
+    defer_upload: bool = False,
+    pdf_cache: bool = False,
+):
+    """Generate, render and upload one kind of subject/grade content as a PDF.
+
+    Shared by the lesson plan, study material and quiz endpoints, so caching,
+    the generation limit, PDF rendering and upload behave the same for each.
+    With defer_upload, the response carries the content-addressed URL and
+    the upload runs in an app-level task. With pdf_cache, a PDF already
+    rendered for identical content is reused instead of rendering it again.
+    """
+    try:
+        logger.info(
+            "Received request to generate %s: subject=%s, grade=%s, topic=%s",
+            label,
+            request.subject,
+            request.grade,
+            request.topic,
         )
-        filename = f"worksheet{subject_part}_grade_{request.grade}.pdf"
-        firebase_url = firebase_service.upload_bytes(
-            content_bytes=pdf_bytes,
-            folder="content/worksheet",
-            filename=filename,
-            content_type="application/pdf",
+
+        cache_key = make_key(
+            content_type,
+            request.subject,
+            request.grade,
+            request.topic,
+            request.description,
         )
 
-        if not firebase_url:
-            raise HTTPException(
-                status_code=500, detail="Failed to upload worksheet to Firebase Storage"
-            )
+        async def produce():
+            # Generate content using the service with structured parameters
+            async with GENERATION_SEMAPHORE:
+                content = await generate(
+                    request.subject, request.grade, request.topic, request.description
+                )
+
+            # Reuse the PDF if this exact content was rendered before
+            pdf_bytes = None
+            if pdf_cache:
+                pdf_bytes = await asyncio.to_thread(
+                    firebase_service.get_existing,
+                    f"{PDF_CACHE_FOLDER}/{pdf_cache_filename(content)}",
+                )
+                if pdf_bytes is not None:
+                    logger.info("Using cached %s PDF: %d bytes", label, len(pdf_bytes))
+
+            # Convert to PDF
+            if pdf_bytes is None:
+                pdf_bytes = await run_in_pdf_pool(to_pdf, content)
+                if pdf_cache:
+                    # Store under the content key so identical requests skip
+                    # rendering; the write overlaps the upload below
+                    firebase_service.upload_bytes_background(
+                        content_bytes=pdf_bytes,
+                        folder=PDF_CACHE_FOLDER,
+                        filename=pdf_cache_filename(content),
+                        content_type=PDF_CONTENT_TYPE,
+                        timestamped=False,
+                    )
+
+            logger.info("Successfully generated %s PDF", label)
+
+            # Upload to Firebase Storage
+            folder = f"content/{content_type}"
+            digest = _content_digest(content)
+            filename = f"{content_type}_{_slug(request.subject)}_grade_{request.grade}_{digest}.pdf"
+            if not defer_upload:
+                firebase_url = await firebase_service.upload_bytes_async(
+                    content_bytes=pdf_bytes,
+                    folder=folder,
+                    filename=filename,
+                    content_type=PDF_CONTENT_TYPE,
+                    timestamped=False,
+                )
+            else:
+                firebase_url = firebase_service.get_public_url(f"{folder}/{filename}")
+
+            if not firebase_url:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to upload {label} to Firebase Storage",
+                )
+
+            # Return JSON response with the URL
+            response = {
+                "success": True,
+                "message": f"{label.capitalize()} generated successfully",
+                "url": firebase_url,
+                "type": content_type,
+                **(extra_fields(content) if extra_fields else {}),
+                "subject": request.subject,
+                "grade": request.grade,
+                "topic": request.topic,
+            }
+            # Encoded once for the cache and the response body
+            response_json = orjson.dumps(response)
+
+            if not defer_upload:
+                logger.info(
+                    "%s uploaded to Firebase: %s", label.capitalize(), firebase_url
+                )
+                await cache_service.set(cache_key, response_json.decode())
+            else:
+                # Not the caller's BackgroundTasks: coalesced waiters share this
+                # URL, so the upload must not depend on the first request
+                task = asyncio.create_task(
+                    _upload_and_cache(
+                        pdf_bytes, folder, filename, cache_key, response_json
+                    )
+                )
+                _DEFERRED_UPLOADS.add(task)
+                task.add_done_callback(_DEFERRED_UPLOADS.discard)
 
-        logger.info(f"Worksheet uploaded to Firebase: {firebase_url}")
+            return response_json
 
-        # Return JSON response with the URL
-        return {
-            "success": True,
-            "message": f"Worksheet generated successfully for grade {request.grade}",
-            "url": firebase_url,
-            "type": "worksheet",
-            "grade": request.grade,
-            "subject": request.subject,
-            "topic": request.topic,
-        }
+        return await _serve_cached(cache_key, label, produce)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating worksheet: {str(e)}", exc_info=True)
+        logger.error("Error generating %s: %s", label, e, exc_info=True)
         raise HTTPException(
-            status_code=500, detail=f"Failed to generate worksheet: {str(e)}"
+            status_code=500, detail=f"Failed to generate {label}: {str(e)}"
         )
 
 
@@ -164,59 +624,17 @@ async def generate_lesson_plan_endpoint(request: LessonPlanRequest):
 
     Returns: JSON response with the Firebase URL of the generated lesson plan PDF
     """
-    try:
-        logger.info(
-            f"Received request to generate lesson plan: subject={request.subject}, grade={request.grade}, topic={request.topic}"
-        )
-
-        # Generate lesson plan using the service with structured parameters
-        lesson_plan = await generate_lesson_plan(
-            request.subject, request.grade, request.topic, request.description
-        )
-
-        # Convert to PDF
-        pdf_bytes = lesson_plan_to_pdf_bytes(lesson_plan)
-
-        logger.info("Successfully generated lesson plan PDF")
-
-        # Upload to Firebase Storage
-        filename = f"lesson_plan_{request.subject.lower().replace(' ', '_')}_grade_{request.grade}.pdf"
-        firebase_url = firebase_service.upload_bytes(
-            content_bytes=pdf_bytes,
-            folder="content/lesson_plan",
-            filename=filename,
-            content_type="application/pdf",
-        )
-
-        if not firebase_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload lesson plan to Firebase Storage",
-            )
-
-        logger.info(f"Lesson plan uploaded to Firebase: {firebase_url}")
-
-        # Return JSON response with the URL
-        return {
-            "success": True,
-            "message": "Lesson plan generated successfully",
-            "url": firebase_url,
-            "type": "lesson_plan",
-            "title": (
-                lesson_plan.title if hasattr(lesson_plan, "title") else "Lesson Plan"
-            ),
-            "subject": request.subject,
-            "grade": request.grade,
-            "topic": request.topic,
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error generating lesson plan: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate lesson plan: {str(e)}"
-        )
+    return await _run_content_pipeline(
+        "lesson_plan",
+        "lesson plan",
+        request,
+        generate_lesson_plan,
+        lesson_plan_to_pdf_bytes,
+        extra_fields=lambda lesson_plan: {
+            "title": getattr(lesson_plan, "title", "Lesson Plan")
+        },
+        pdf_cache=True,
+    )
 
 
 @app.post("/generate_study_material")
@@ -237,56 +655,14 @@ async def generate_study_material_endpoint(request: StudyMaterialRequest):
 
     Returns: JSON response with the Firebase URL of the generated study material PDF
     """
-    try:
-        logger.info(
-            f"Received request to generate study material: subject={request.subject}, grade={request.grade}, topic={request.topic}"
-        )
-
-        # Generate study material using the service with structured parameters
-        study_material = await generate_study_material(
-            request.subject, request.grade, request.topic, request.description
-        )
-
-        logger.info("Successfully generated study material")
-
-        # Convert study material to PDF bytes
-        pdf_bytes = study_material_to_pdf_bytes(study_material)
-
-        # Upload to Firebase Storage
-        filename = f"study_material_{request.subject.lower().replace(' ', '_')}_grade_{request.grade}.pdf"
-        firebase_url = firebase_service.upload_bytes(
-            content_bytes=pdf_bytes,
-            folder="content/study_material",
-            filename=filename,
-            content_type="application/pdf",
-        )
-
-        if not firebase_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload study material to Firebase Storage",
-            )
-
-        logger.info(f"Study material uploaded to Firebase: {firebase_url}")
-
-        # Return JSON response with the URL
-        return {
-            "success": True,
-            "message": "Study material generated successfully",
-            "url": firebase_url,
-            "type": "study_material",
-            "subject": request.subject,
-            "grade": request.grade,
-            "topic": request.topic,
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error generating study material: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate study material: {str(e)}"
-        )
+    return await _run_content_pipeline(
+        "study_material",
+        "study material",
+        request,
+        generate_study_material,
+        study_material_to_pdf_bytes,
+        defer_upload=True,
+    )
 
 
 @app.post("/ask_sahayak")
@@ -309,18 +685,22 @@ async def ask_sahayak_endpoint(request: AskSahayakRequest):
     """
     try:
         logger.info(
-            f"Received ask_sahayak request from user {request.user_id}, session: {request.session_id}"
+            "Received ask_sahayak request from user %s, session: %s",
+            request.user_id,
+            request.session_id,
         )
 
         # Call the ask_sahayak_question function
-        result = await ask_sahayak_question(
-            question=request.question,
-            user_id=request.user_id,
-            session_id=request.session_id,
-        )
+        async with GENERATION_SEMAPHORE:
+            result = await ask_sahayak_question(
+                question=request.question,
+                user_id=request.user_id,
+                session_id=request.session_id,
+            )
 
         logger.info(
-            f"Successfully processed ask_sahayak request for session: {result.session_id}"
+            "Successfully processed ask_sahayak request for session: %s",
+            result.session_id,
         )
 
         # Return JSON response
@@ -335,7 +715,7 @@ async def ask_sahayak_endpoint(request: AskSahayakRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing ask_sahayak request: {str(e)}", exc_info=True)
+        logger.error("Error processing ask_sahayak request: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, detail=f"Failed to process question: {str(e)}"
         )
@@ -359,56 +739,9 @@ async def generate_quiz_endpoint(request: QuizRequest):
 
     Returns: JSON response with the Firebase URL of the generated quiz PDF
     """
-    try:
-        logger.info(
-            f"Received request to generate quiz: subject={request.subject}, grade={request.grade}, topic={request.topic}"
-        )
-
-        # Generate quiz using the service with structured parameters
-        quiz = await generate_quiz(
-            request.subject, request.grade, request.topic, request.description
-        )
-
-        logger.info("Successfully generated quiz")
-
-        # Convert quiz to PDF bytes
-        pdf_bytes = quiz_to_pdf_bytes(quiz)
-
-        # Upload to Firebase Storage
-        filename = f"quiz_{request.subject.lower().replace(' ', '_')}_grade_{request.grade}.pdf"
-        firebase_url = firebase_service.upload_bytes(
-            content_bytes=pdf_bytes,
-            folder="content/quiz",
-            filename=filename,
-            content_type="application/pdf",
-        )
-
-        if not firebase_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload quiz to Firebase Storage",
-            )
-
-        logger.info(f"Quiz uploaded to Firebase: {firebase_url}")
-
-        # Return JSON response with the URL
-        return {
-            "success": True,
-            "message": "Quiz generated successfully",
-            "url": firebase_url,
-            "type": "quiz",
-            "subject": request.subject,
-            "grade": request.grade,
-            "topic": request.topic,
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error generating quiz: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to generate quiz: {str(e)}"
-        )
+    return await _run_content_pipeline(
+        "quiz", "quiz", request, generate_quiz, quiz_to_pdf_bytes
+    )
 
 
 @app.post("/generate_visual_aid")
@@ -432,16 +765,20 @@ async def generate_visual_aid_endpoint(request: VisualAidRequest):
     """
     try:
         logger.info(
-            f"Received request to generate visual aid: topic='{request.topic}', subject={request.subject}, grade={request.grade}"
+            "Received request to generate visual aid: topic='%s', subject=%s, grade=%s",
+            request.topic,
+            request.subject,
+            request.grade,
         )
 
         # Generate visual aid using the service with structured parameters
-        visual_aid = await generate_visual_aid(
-            subject=request.subject,
-            grade=request.grade,
-            topic=request.topic,
-            description=request.description,
-        )
+        async with GENERATION_SEMAPHORE:
+            visual_aid = await generate_visual_aid(
+                subject=request.subject,
+                grade=request.grade,
+                topic=request.topic,
+                description=request.description,
+            )
 
         logger.info("Successfully generated visual aid")
 
@@ -462,7 +799,7 @@ async def generate_visual_aid_endpoint(request: VisualAidRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating visual aid: {str(e)}", exc_info=True)
+        logger.error("Error generating visual aid: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, detail=f"Failed to generate visual aid: {str(e)}"
         )
@@ -480,7 +817,7 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
     Returns: JSON response with the Firebase URL of the uploaded file
     """
     try:
-        logger.info(f"Received file upload request: {file.filename}")
+        logger.info("Received file upload request: %s", file.filename)
 
         # Validate file type
         allowed_types = {
@@ -492,7 +829,7 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
 
         content_type = file.content_type
         if content_type not in allowed_types:
-            logger.warning(f"Invalid file type: {content_type}")
+            logger.warning("Invalid file type: %s", content_type)
             raise HTTPException(
                 status_code=400,
                 detail=f"File type not supported. Allowed types: {', '.join(allowed_types.keys())}",
@@ -526,11 +863,14 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
             filename = f"{name_part}_{timestamp}{extension}"
 
         logger.info(
-            f"Uploading file: {filename}, size: {len(file_content)} bytes, type: {content_type}"
+            "Uploading file: %s, size: %s bytes, type: %s",
+            filename,
+            len(file_content),
+            content_type,
         )
 
         # Upload to Firebase Storage
-        firebase_url = firebase_service.upload_bytes(
+        firebase_url = await firebase_service.upload_bytes_async(
             content_bytes=file_content,
             folder="content/misc",
             filename=filename,
@@ -542,7 +882,7 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
                 status_code=500, detail="Failed to upload file to Firebase Storage"
             )
 
-        logger.info(f"File uploaded successfully to Firebase: {firebase_url}")
+        logger.info("File uploaded successfully to Firebase: %s", firebase_url)
 
         return {
             "success": True,
@@ -556,7 +896,7 @@ async def upload_file_endpoint(file: UploadFile = File(...)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error uploading file: {str(e)}", exc_info=True)
+        logger.error("Error uploading file: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 
@@ -569,10 +909,12 @@ async def evaluate_quiz_endpoint(request: EvalQuizRequest):
     """
     try:
         logger.info(
-            f"Received request to evaluate student submission against quiz evaluation metrcis"
+            "Received request to evaluate student submission against quiz evaluation metrcis"
         )
-        # Extracting text from Student submission
-        extract_text = extract_text_from_pdf_with_docai(
+        # Extracting text from Student submission; Document AI, Gemini and the
+        # JSON fetch below are blocking calls, so they run in worker threads
+        extract_text = await asyncio.to_thread(
+            extract_text_from_pdf_with_docai,
             # file_path=EvalQuizRequest.student_submission_url,
             file_path=r"C:\Users\Vipin-M\OneDrive\Documents\Agentic-AI-Google-ADK\Geography_Quiz_Student.pdf",
             project_id=PROJECT_ID,  # Not numeric
@@ -580,10 +922,12 @@ async def evaluate_quiz_endpoint(request: EvalQuizRequest):
             processor_id=PROCESSOR_ID,
         )
         # Creating Student JSON from raw text
-        student_json = extract_quiz_answers_from_text(extract_text)
+        student_json = await asyncio.to_thread(
+            extract_quiz_answers_from_text, extract_text
+        )
 
         # Fetching Master Quiz JSON
-        response = requests.get(url)
+        response = await asyncio.to_thread(requests.get, url)
         # Raise an error if request failed
         response.raise_for_status()
         # Convert JSON text to Python dict/list
@@ -601,7 +945,7 @@ async def evaluate_quiz_endpoint(request: EvalQuizRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error evaluating quiz: {str(e)}", exc_info=True)
+        logger.error("Error evaluating quiz: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, detail=f"Failed to evaluate quiz: {str(e)}"
         )
@@ -610,4 +954,16 @@ async def evaluate_quiz_endpoint(request: EvalQuizRequest):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers are set with WEB_CONCURRENCY; each one's PDF pool gets an equal
+    # share of the cores, so raising it does not oversubscribe the CPU. "auto"
+    # picks uvloop and httptools where installed and falls back on Windows
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        limit_concurrency=256,
+        timeout_keep_alive=30,
+    )